@@ -0,0 +1,215 @@
+import argparse
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+import duckdb
+import numpy as np
+import pandas as pd
+import forecasters
+
+DB_PATH = os.path.join("nobil-playground", "database.db")
+HORIZON_HOURS = 24  # Hours forecast after the cutoff
+MIN_HISTORY_DAYS = 14  # Sites with less history get the seasonal profile baseline
+BATCH_WORKERS = os.cpu_count() or 1
+MAX_WORKER_MB = None  # Address space limit per worker process (None: unlimited)
+SITES_PER_QUERY = 500  # Sites whose hourly series are read from DuckDB at a time
+TASKS_PER_WORKER = 50  # Worker processes are replaced after this many sites to release memory
+METRICS = ('utilization', 'busy_minutes', 'sessions')  # Forecastable columns of site_hourly
+
+FORECAST_TABLE_SQL = """
+CREATE TABLE IF NOT EXISTS site_forecast (
+    site_id VARCHAR,
+    cutoff TIMESTAMP,
+    ds TIMESTAMP,
+    yhat DOUBLE,
+    yhat_lower DOUBLE,
+    yhat_upper DOUBLE,
+    method VARCHAR,
+    metric VARCHAR
+)
+"""
+
+def default_cutoff(con):
+    """
+    Returns the start of the day after the latest aggregated hour, i.e. a day-ahead forecast.
+    """
+    latest = con.execute("SELECT MAX(hour) FROM site_hourly").fetchone()[0]
+    return pd.Timestamp(latest).normalize() + pd.Timedelta(days=1)
+
+def iter_site_series(con, cutoff, site_ids=None, metric='utilization', sites_per_query=SITES_PER_QUERY):
+    """
+    Yields (site_id, hours, values) for every site with sessions before `cutoff`: the hours
+    (datetime64) of the site's site_hourly rows (see nobil_data_analysis.build_site_hourly)
+    and their `metric`. Hours without sessions have no row; the series are read
+    `sites_per_query` sites at a time.
+    """
+    if metric not in METRICS:
+        raise ValueError(f"Unknown metric {metric!r}, expected one of {METRICS}")
+    if site_ids is None:
+        site_ids = [row[0] for row in con.execute(
+            "SELECT DISTINCT site_id FROM site_hourly WHERE hour < ? ORDER BY site_id", [cutoff]).fetchall()]
+    for i in range(0, len(site_ids), sites_per_query):
+        chunk = site_ids[i:i + sites_per_query]
+        hourly = con.execute(f"""
+            SELECT site_id, hour, {metric}::DOUBLE AS value
+            FROM site_hourly
+            WHERE hour < ? AND site_id IN (SELECT UNNEST(?))
+            ORDER BY site_id, hour
+        """, [cutoff, chunk]).df()
+        # Each site's rows are contiguous after the sort
+        sites = hourly['site_id'].to_numpy()
+        bounds = np.flatnonzero(sites[1:] != sites[:-1]) + 1
+        for rows in np.split(np.arange(len(hourly)), bounds):
+            if len(rows):
+                yield (sites[rows[0]], hourly['hour'].to_numpy()[rows], hourly['value'].to_numpy()[rows])
+
+def forecast_site(site_id, hours, values, cutoff, horizon=HORIZON_HOURS, min_history_days=MIN_HISTORY_DAYS,
+                  engine='prophet'):
+    """
+    Forecasts the hourly series of one site for `horizon` hours from `cutoff` with `engine`
+    (a forecasters.FORECASTERS name, or 'auto' to use Prophet only where it beats the baselines).
+    Sites with less than `min_history_days` of history, and Prophet fits that fail, fall back to
+    the seasonal profile baseline.
+
+    Returns:
+        A long DataFrame with the columns 'site_id', 'cutoff', 'ds', 'yhat', 'yhat_lower',
+        'yhat_upper' (NaN for engines without intervals) and 'method' (the engine used).
+    """
+    # Dense hourly history from the first session until the cutoff, zero in hours without sessions
+    index = pd.date_range(pd.Timestamp(hours[0]), cutoff, freq='h', inclusive='left')
+    train_df = pd.DataFrame({'ds': index, 'y': 0.0})
+    train_df.loc[index.get_indexer(pd.DatetimeIndex(hours)), 'y'] = values
+    result = pd.DataFrame({'site_id': site_id, 'cutoff': cutoff, 'ds': pd.date_range(cutoff, periods=horizon, freq='h')})
+
+    forecaster = forecasters.make_forecaster('profile')
+    if len(train_df) >= min_history_days * 24:
+        if engine == 'auto':
+            forecaster, _ = forecasters.select_forecaster(train_df, prophet_params=forecasters.PROPHET_PARAMS)
+        else:
+            forecaster = forecasters.make_forecaster(engine, forecasters.PROPHET_PARAMS)
+    try:
+        fcst = forecaster.fit(train_df).predict(result)
+    except Exception as e:
+        print(f"[WARN] {forecaster.name} failed for site {site_id}, using the profile baseline: {e}")
+        forecaster = forecasters.make_forecaster('profile')
+        fcst = forecaster.fit(train_df).predict(result)
+
+    result = result.join(fcst.drop(columns='ds').reindex(columns=['yhat', 'yhat_lower', 'yhat_upper']))
+    result['method'] = forecaster.name
+    return result
+
+def _limit_worker_memory(max_worker_mb):
+    if max_worker_mb:
+        import resource
+        limit = int(max_worker_mb * 2**20)
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+def _forecast_site_worker(task):
+    site_id = task[0]
+    try:
+        return forecast_site(*task)
+    except MemoryError:
+        print(f"[WARN] Site {site_id} exceeded the worker memory limit, skipped.")
+        return None
+
+def forecast_sites(con, cutoff=None, horizon=HORIZON_HOURS, min_history_days=MIN_HISTORY_DAYS,
+                   site_ids=None, workers=BATCH_WORKERS, max_worker_mb=MAX_WORKER_MB, engine='prophet',
+                   metric='utilization'):
+    """
+    Forecasts `metric` of every site in the site_hourly table (or `site_ids`) for `horizon` hours
+    from `cutoff` (default: the day after the latest hour) with `engine` on a pool of `workers`
+    processes.
+
+    At most two sites per worker are in flight, so only those series are held in memory besides
+    the chunk being read; each worker is capped at `max_worker_mb` MB and replaced after
+    TASKS_PER_WORKER sites (with workers=1 the sites run in this process, without a cap). A site that fails is reported and skipped, the rest of the batch goes on.
+
+    Returns:
+        The long-format forecasts of all sites (see forecast_site), with a 'metric' column.
+    """
+    cutoff = pd.Timestamp(cutoff) if cutoff is not None else default_cutoff(con)
+    print(f"[INFO] Forecasting {metric} {horizon}h from {cutoff} with {workers} workers...")
+    started = time.perf_counter()
+    tasks = ((site_id, hours, values, cutoff, horizon, min_history_days, engine)
+             for site_id, hours, values in iter_site_series(con, cutoff, site_ids, metric))
+
+    results = []
+    if workers <= 1:
+        results = [_forecast_site_worker(task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_limit_worker_memory, initargs=(max_worker_mb,),
+                                 max_tasks_per_child=TASKS_PER_WORKER) as pool:
+            pending = set()
+            for task in tasks:
+                if len(pending) >= 2 * workers:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    results.extend(_collect(done))
+                pending.add(pool.submit(_forecast_site_worker, task))
+            results.extend(_collect(pending))
+
+    forecasts = [r for r in results if r is not None]
+    skipped = len(results) - len(forecasts)
+    if not forecasts:
+        print("[WARN] No site could be forecast.")
+        return pd.DataFrame(columns=['site_id', 'cutoff', 'ds', 'yhat', 'yhat_lower', 'yhat_upper', 'method', 'metric'])
+    forecasts = pd.concat(forecasts, ignore_index=True)
+    forecasts['metric'] = metric
+    methods = forecasts.groupby('method')['site_id'].nunique().to_dict()
+    print(f"[DONE] Forecast {forecasts['site_id'].nunique()} sites {methods}, "
+          f"{skipped} skipped, in {time.perf_counter() - started:.1f}s.")
+    return forecasts
+
+def _collect(futures):
+    """
+    Results of finished futures; a site whose worker died is reported and skipped.
+    """
+    results = []
+    for future in futures:
+        try:
+            results.append(future.result())
+        except Exception as e:
+            print(f"[WARN] Site forecast failed: {e}")
+            results.append(None)
+    return results
+
+def write_forecasts(con, forecasts):
+    """
+    Stores forecasts in the site_forecast table, replacing earlier forecasts of the same sites
+    and metric made at the same cutoff.
+    """
+    con.execute(FORECAST_TABLE_SQL)
+    # Tables created before forecasts recorded their metric
+    con.execute("ALTER TABLE site_forecast ADD COLUMN IF NOT EXISTS metric VARCHAR")
+    con.register("forecast_batch", forecasts)
+    con.execute("BEGIN TRANSACTION")
+    con.execute("""
+        DELETE FROM site_forecast
+        WHERE (site_id, cutoff, metric) IN (SELECT DISTINCT site_id, cutoff, metric FROM forecast_batch)
+    """)
+    con.execute("""
+        INSERT INTO site_forecast
+        SELECT site_id, cutoff, ds, yhat, yhat_lower, yhat_upper, method, metric FROM forecast_batch
+    """)
+    con.execute("COMMIT")
+    con.unregister("forecast_batch")
+    print(f"[DONE] Wrote {len(forecasts)} forecast rows to site_forecast.")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Forecast the hourly utilization of every NOBIL site in DuckDB.")
+    parser.add_argument("--db", default=DB_PATH)
+    parser.add_argument("--cutoff", help="Forecast from this time (default: the day after the latest hour)")
+    parser.add_argument("--metric", choices=METRICS, default="utilization", help="site_hourly column to forecast")
+    parser.add_argument("--horizon", type=int, default=HORIZON_HOURS, help="Hours to forecast")
+    parser.add_argument("--min-history-days", type=float, default=MIN_HISTORY_DAYS)
+    parser.add_argument("--sites", nargs="*", help="Only forecast these sites")
+    parser.add_argument("--workers", type=int, default=BATCH_WORKERS)
+    parser.add_argument("--max-worker-mb", type=float, default=MAX_WORKER_MB)
+    parser.add_argument("--engine", choices=sorted(forecasters.FORECASTERS) + ["auto"], default="prophet")
+    args = parser.parse_args()
+
+    con = duckdb.connect(args.db)
+    forecasts = forecast_sites(con, args.cutoff, args.horizon, args.min_history_days, args.sites,
+                               args.workers, args.max_worker_mb, args.engine, args.metric)
+    if len(forecasts):
+        write_forecasts(con, forecasts)
+    con.close()
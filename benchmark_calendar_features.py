@@ -0,0 +1,79 @@
+import time
+from datetime import date
+import numpy as np
+import pandas as pd
+from pandas.api.types import CategoricalDtype
+import calendar_features
+import prophet_forecasting
+
+# Microbenchmark: calendar table lookups (prophet_forecasting.create_features) against the previous
+# per-call .dt accessor version
+
+cat_type = CategoricalDtype(categories=['Monday','Tuesday', 'Wednesday','Thursday','Friday','Saturday','Sunday'],ordered=True)
+
+def create_features_accessors(df, label=None):
+    """
+    Previous implementation: a dozen .dt accessors, day_name() and pd.cut on every call.
+    """
+    df = df.copy()
+    df['date'] = df.index
+    df['hour'] = df['date'].dt.hour
+    df['dayofweek'] = df['date'].dt.dayofweek
+    df['weekday'] = df['date'].dt.day_name()
+    df['weekday'] = df['weekday'].astype(cat_type)
+    df['quarter'] = df['date'].dt.quarter
+    df['month'] = df['date'].dt.month
+    df['year'] = df['date'].dt.year
+    df['dayofyear'] = df['date'].dt.dayofyear
+    df['dayofmonth'] = df['date'].dt.day
+    df['weekofyear'] = df['date'].dt.isocalendar().week
+    df['date_offset'] = (df.date.dt.month*100 + df.date.dt.day - 320)%1300
+
+    df['season'] = pd.cut(df['date_offset'], [0, 300, 602, 900, 1300],
+                          labels=['Spring', 'Summer', 'Fall', 'Winter']
+                   )
+    X = df[['hour','dayofweek','quarter','month','year',
+           'dayofyear','dayofmonth','weekofyear','weekday',
+           'season']]
+    if label:
+        y = df[label]
+        return X, y
+    return X
+
+def make_hourly(sites, years, seed=0):
+    """
+    Hourly energy of `sites` sites over `years` years, stacked, indexed by 'Start time'.
+    """
+    rng = np.random.default_rng(seed)
+    hours = pd.date_range('2021-01-01', periods=int(years * 8760), freq='h', name='Start time')
+    index = pd.DatetimeIndex(np.tile(hours, sites), name='Start time')
+    return pd.DataFrame({'Energy_Wh': rng.random(len(index)) * 100}, index=index)
+
+def best_time(func, repeat=3):
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - started)
+    return min(times)
+
+if __name__ == '__main__':
+    for sites, years in [(1, 1), (10, 3), (100, 3)]:
+        df = make_hourly(sites, years)
+        expected = create_features_accessors(df)
+        result = prophet_forecasting.create_features(df)
+        for column in expected.columns:
+            assert (expected[column].astype(str).to_numpy() == result[column].astype(str).to_numpy()).all(), column
+
+        accessors = best_time(lambda: create_features_accessors(df))
+        table = best_time(lambda: prophet_forecasting.create_features(df))
+        memory = expected.memory_usage(deep=True).sum() / result.memory_usage(deep=True).sum()
+        print(f"{len(df):9d} rows: accessors {accessors * 1000:8.1f} ms, calendar table {table * 1000:7.1f} ms "
+              f"({accessors / table:5.1f}x), {memory:4.1f}x less memory")
+
+    # Extra day features are only gathered when requested
+    holidays = calendar_features.calendar_features(pd.date_range('2024-01-01', '2024-12-31', freq='D'),
+                                                   features=['holiday_se'])
+    assert holidays.loc['2024-06-21', 'holiday_se'] and not holidays.loc['2024-06-20', 'holiday_se']
+    assert calendar_features.easter_sunday(2025) == date(2025, 4, 20)
+    print(f"Swedish holidays in 2024 (incl. eves): {int(holidays['holiday_se'].sum())}")
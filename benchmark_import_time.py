@@ -0,0 +1,52 @@
+import argparse
+import os
+import subprocess
+import sys
+
+# Import-time budget check: imports each library module in a fresh interpreter under
+# `python -X importtime` and fails when it loads a heavy dependency or exceeds its budget.
+
+BUDGET_MS = 1500  # Cumulative import time allowed per module, pandas included
+HEAVY_MODULES = ('prophet', 'cmdstanpy', 'matplotlib', 'seaborn', 'sklearn', 'scipy')
+MODULES = ('prophet_forecasting', 'process_data', 'forecasters', 'batch_forecast')
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+
+def import_times(module):
+    """
+    Returns {imported module name: cumulative import time in ms} for a fresh `import module`.
+    """
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                            capture_output=True, text=True, check=True, cwd=REPO_DIR)
+    times = {}
+    for line in result.stderr.splitlines():
+        # "import time: self [us] | cumulative | imported package"
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        times[name.strip()] = int(cumulative) / 1000
+    return times
+
+def check_module(module, budget_ms=BUDGET_MS):
+    """
+    Prints the import time of `module` and returns a list of budget violations.
+    """
+    times = import_times(module)
+    heavy = sorted(name for name in times if name.split('.')[0] in HEAVY_MODULES and '.' not in name)
+    total = times[module]
+    print(f"{module:22s} {total:8.1f} ms (pandas {times.get('pandas', 0):.1f} ms)"
+          + (f", heavy imports: {', '.join(heavy)}" if heavy else ""))
+    problems = [f"{module} imports {name}" for name in heavy]
+    if total > budget_ms:
+        problems.append(f"{module} takes {total:.0f} ms to import (budget {budget_ms} ms)")
+    return problems
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Check that library modules import fast and without heavy dependencies.")
+    parser.add_argument('modules', nargs='*', default=MODULES)
+    parser.add_argument('--budget-ms', type=float, default=BUDGET_MS)
+    args = parser.parse_args()
+
+    problems = [p for module in args.modules for p in check_module(module, args.budget_ms)]
+    for problem in problems:
+        print(f"FAIL: {problem}")
+    sys.exit(1 if problems else 0)
@@ -0,0 +1,52 @@
+import time
+import numpy as np
+import pandas as pd
+import integration_mock_up
+
+# Microbenchmark: vectorized compute_hourly_price_index against the previous row-wise version
+
+def compute_hourly_price_index_rowwise(fcst_day, scalemin, scalemax):
+    """
+    Previous implementation: pandas rolling window plus a Python call per row.
+    """
+    df = fcst_day[['ds', 'yhat']].copy().set_index('ds')
+    rolling = df.rolling('24h', center=True)
+    df['ymin'] = rolling['yhat'].min()
+    df['ymax'] = rolling['yhat'].max()
+    df = df.reset_index()
+    df['price_index'] = df.apply(
+        lambda r: (scalemin + scalemax) / 2 if r['ymax'] == r['ymin']
+        else (r['yhat'] - r['ymin']) / (r['ymax'] - r['ymin']) * (scalemax - scalemin) + scalemin, axis=1)
+    return df[['ds', 'price_index']]
+
+def make_forecasts(days, seed=0):
+    """
+    Random day-ahead forecasts: 24 hourly 'yhat' values per day, with a 'date' column.
+    """
+    rng = np.random.default_rng(seed)
+    ds = pd.date_range('2024-01-01', periods=24 * days, freq='h')
+    return pd.DataFrame({'ds': ds, 'yhat': rng.random(len(ds)) * 100, 'date': ds.date})
+
+def best_time(func, repeat=3):
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - started)
+    return min(times)
+
+if __name__ == '__main__':
+    for days in [1, 30, 365]:
+        forecasts = make_forecasts(days)
+        day_frames = [day for _, day in forecasts.groupby('date')]
+
+        rowwise = best_time(lambda: [compute_hourly_price_index_rowwise(day, 0.6, 1.4) for day in day_frames])
+        per_day = best_time(lambda: [integration_mock_up.compute_hourly_price_index(day, 0.6, 1.4) for day in day_frames])
+        batch = best_time(lambda: integration_mock_up.compute_hourly_price_index(forecasts, 0.6, 1.4, by='date'))
+
+        expected = pd.concat([compute_hourly_price_index_rowwise(day, 0.6, 1.4) for day in day_frames])
+        result = integration_mock_up.compute_hourly_price_index(forecasts, 0.6, 1.4, by='date')
+        assert np.allclose(expected['price_index'].to_numpy(), result['price_index'].to_numpy())
+
+        print(f"{days:4d} days: row-wise {rowwise * 1000:8.1f} ms, vectorized per day {per_day * 1000:8.1f} ms "
+              f"({rowwise / per_day:5.1f}x), batch {batch * 1000:6.1f} ms ({rowwise / batch:6.1f}x)")
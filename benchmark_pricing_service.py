@@ -0,0 +1,94 @@
+import argparse
+import http.client
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+import numpy as np
+import pandas as pd
+import pricing_service
+
+# Load test for the pricing service: concurrent clients send single-hour and batch requests over
+# keep-alive connections and the p50/p99 latency of each request type is reported.
+
+def make_prices(sites, hours=24, start='2024-06-18', seed=0):
+    """
+    Random price curves for `sites` synthetic sites, in the format of PriceRegistry.publish.
+    """
+    rng = np.random.default_rng(seed)
+    ds = pd.date_range(start, periods=hours, freq='h')
+    site_ids = np.repeat([f"SWE_{i:05d}" for i in range(sites)], hours)
+    return pd.DataFrame({'site_id': site_ids, 'ds': np.tile(ds, sites), 'yhat': rng.random(sites * hours),
+                         'price_index': 0.6 + 0.8 * rng.random(sites * hours), 'method': 'profile'})
+
+def run_client(url, requests, batch_size, seed):
+    """
+    Sends `requests` requests on one connection and returns their latencies in seconds.
+    batch_size 1 uses GET /price, larger sizes POST /prices with that many hours.
+    """
+    status = json.loads(_get(url, "/status"))
+    rng = np.random.default_rng(seed)
+    site_ids = json.loads(_get(url, "/sites"))['sites']
+    parsed = urlparse(url)
+    conn = http.client.HTTPConnection(parsed.hostname, parsed.port)
+    latencies = []
+    for _ in range(requests):
+        picks = [(site_ids[rng.integers(len(site_ids))], f"{status['cutoff'][:10]}T{rng.integers(24):02d}")
+                 for _ in range(batch_size)]
+        started = time.perf_counter()
+        if batch_size == 1:
+            conn.request("GET", f"/price?site={picks[0][0]}&hour={picks[0][1]}")
+        else:
+            body = json.dumps({'requests': [{'site': s, 'hour': h} for s, h in picks]})
+            conn.request("POST", "/prices", body, {"Content-Type": "application/json"})
+        response = conn.getresponse()
+        response.read()
+        latencies.append(time.perf_counter() - started)
+        if response.status != 200:
+            raise RuntimeError(f"Request failed with HTTP {response.status}")
+    conn.close()
+    return latencies
+
+def _get(url, path):
+    parsed = urlparse(url)
+    conn = http.client.HTTPConnection(parsed.hostname, parsed.port)
+    conn.request("GET", path)
+    body = conn.getresponse().read()
+    conn.close()
+    return body
+
+def load_test(url, clients, requests, batch_size):
+    """
+    Runs `clients` concurrent clients of `requests` requests each and returns their latencies.
+    """
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        results = list(pool.map(run_client, [url] * clients, [requests] * clients, [batch_size] * clients, range(clients)))
+    seconds = time.perf_counter() - started
+    latencies = np.concatenate(results) * 1000
+    print(f"batch {batch_size:4d}, {clients:3d} clients: p50 {np.percentile(latencies, 50):7.2f} ms, "
+          f"p99 {np.percentile(latencies, 99):7.2f} ms, {len(latencies) / seconds:8.0f} requests/s, "
+          f"{len(latencies) * batch_size / seconds:9.0f} prices/s")
+    return latencies
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Load-test the pricing service and report p50/p99 latency.")
+    parser.add_argument('--url', help="Running service to test (default: an in-process service with synthetic prices)")
+    parser.add_argument('--sites', type=int, default=5000, help="Synthetic sites when no --url is given")
+    parser.add_argument('--clients', type=int, nargs='*', default=[1, 8, 32])
+    parser.add_argument('--requests', type=int, default=200, help="Requests per client")
+    parser.add_argument('--batch-sizes', type=int, nargs='*', default=[1, 100])
+    args = parser.parse_args()
+
+    url = args.url
+    if url is None:
+        registry = pricing_service.PriceRegistry()
+        started = time.perf_counter()
+        registry.publish(make_prices(args.sites))
+        print(f"Published {args.sites} synthetic sites in {time.perf_counter() - started:.2f}s")
+        server = pricing_service.serve(registry, port=0)
+        url = f"http://{server.server_address[0]}:{server.server_address[1]}"
+
+    for batch_size in args.batch_sizes:
+        for clients in args.clients:
+            load_test(url, clients, args.requests, batch_size)
@@ -0,0 +1,142 @@
+from datetime import date, timedelta
+import numpy as np
+import pandas as pd
+from pandas.api.types import CategoricalDtype
+
+# Calendar features gathered from a precomputed table with one row per day: the features of a
+# timestamp are the row of its day (days since 1970-01-01) and the hour is plain arithmetic, so a
+# batch of timestamps costs one integer division and one indexed gather per column. The table is
+# built once per range of days and grows when later data falls outside it.
+
+NS_PER_HOUR = 3_600_000_000_000
+
+WEEKDAY_TYPE = CategoricalDtype(categories=['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday'],
+                                ordered=True)
+SEASON_TYPE = CategoricalDtype(categories=['Spring', 'Summer', 'Fall', 'Winter'], ordered=True)
+
+# Features of create_features, in its column order
+DEFAULT_FEATURES = ('hour', 'dayofweek', 'quarter', 'month', 'year', 'dayofyear', 'dayofmonth', 'weekofyear',
+                    'weekday', 'season')
+
+def _base_day_features(days):
+    """
+    Features of each day in `days` (DatetimeIndex at midnight), in compact dtypes.
+    """
+    iso = days.isocalendar()
+    date_offset = (days.month * 100 + days.day - 320) % 1300
+    return {
+        'dayofweek': days.dayofweek.to_numpy(np.int8),
+        'quarter': days.quarter.to_numpy(np.int8),
+        'month': days.month.to_numpy(np.int8),
+        'year': days.year.to_numpy(np.int16),
+        'dayofyear': days.dayofyear.to_numpy(np.int16),
+        'dayofmonth': days.day.to_numpy(np.int8),
+        'weekofyear': iso['week'].to_numpy(np.int8),
+        'weekday': pd.Categorical.from_codes(days.dayofweek.to_numpy(np.int8), dtype=WEEKDAY_TYPE),
+        # Right-closed bins as in create_features, so the offset 0 (March 20) has no season
+        'season': pd.cut(date_offset, [0, 300, 602, 900, 1300], labels=SEASON_TYPE.categories).astype(SEASON_TYPE),
+    }
+
+def easter_sunday(year):
+    """
+    Date of Easter Sunday (Gregorian calendar, anonymous algorithm).
+    """
+    a, b, c = year % 19, year // 100, year % 100
+    d, e = divmod(b, 4)
+    g = (8 * b + 13) // 25
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = divmod(c, 4)
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * l) // 451
+    month, day = divmod(h + l - 7 * m + 114, 31)
+    return date(year, month, day + 1)
+
+def swedish_holidays(year):
+    """
+    Swedish public holidays of `year`, plus the eves treated as holidays (Midsummer, Christmas
+    and New Year's Eve).
+    """
+    easter = easter_sunday(year)
+    # Midsummer Eve is the Friday between June 19 and 25; All Saints' Day the Saturday between
+    # October 31 and November 6
+    midsummer_eve = date(year, 6, 19) + timedelta(days=(4 - date(year, 6, 19).weekday()) % 7)
+    all_saints = date(year, 10, 31) + timedelta(days=(5 - date(year, 10, 31).weekday()) % 7)
+    return {
+        date(year, 1, 1), date(year, 1, 6),
+        easter - timedelta(days=2), easter, easter + timedelta(days=1),
+        date(year, 5, 1), easter + timedelta(days=39), easter + timedelta(days=49), date(year, 6, 6),
+        midsummer_eve, midsummer_eve + timedelta(days=1), all_saints,
+        date(year, 12, 24), date(year, 12, 25), date(year, 12, 26), date(year, 12, 31),
+    }
+
+def swedish_holiday_feature(days):
+    holidays = set().union(*(swedish_holidays(year) for year in range(days.year.min(), days.year.max() + 1)))
+    return np.isin(days.date, list(holidays))
+
+# Extra day features: name -> function of the table's days (DatetimeIndex) returning one value per
+# day. They are computed once per table build and only gathered when requested.
+DAY_FEATURES = {
+    'holiday_se': swedish_holiday_feature,
+}
+
+_table = None  # (first day since epoch, {feature: column}) of the current calendar table
+
+def register_day_feature(name, func):
+    """
+    Adds a day feature (see DAY_FEATURES); the calendar table is rebuilt on next use.
+    """
+    global _table
+    DAY_FEATURES[name] = func
+    _table = None
+
+def calendar_table(first_day, last_day):
+    """
+    Returns (first day, columns) of a calendar table covering days `first_day` to `last_day`
+    (days since epoch), reusing the current table when it covers them. New tables span whole years.
+    """
+    global _table
+    if _table is not None:
+        start, columns = _table
+        if start <= first_day and last_day < start + len(columns['dayofweek']):
+            return _table
+        first_day, last_day = min(first_day, start), max(last_day, start + len(columns['dayofweek']) - 1)
+
+    first = pd.Timestamp(np.datetime64(int(first_day), 'D')).replace(month=1, day=1)
+    last = pd.Timestamp(np.datetime64(int(last_day), 'D')).replace(month=12, day=31)
+    days = pd.date_range(first, last, freq='D')
+    columns = _base_day_features(days)
+    for name, func in DAY_FEATURES.items():
+        columns[name] = np.asarray(func(days))
+    _table = (int(days[0].value // (24 * NS_PER_HOUR)), columns)
+    return _table
+
+def calendar_features(ds, features=DEFAULT_FEATURES, index=None):
+    """
+    Calendar features of the timestamps `ds` (naive, or wall-clock time of tz-aware ones, in any
+    resolution): 'hour' plus any day feature of the calendar table (see DEFAULT_FEATURES and
+    DAY_FEATURES).
+
+    Returns:
+        A DataFrame with one row per timestamp (on `index`, default ds if it is an index) and the
+        requested features, as int8/int16, bool or categorical columns.
+    """
+    times = pd.DatetimeIndex(ds)
+    if times.tz is not None:
+        times = times.tz_localize(None)
+    # Timestamps may come in any resolution (e.g. microseconds from DuckDB)
+    hours = times.as_unit('ns').asi8 // NS_PER_HOUR
+    days = hours // 24
+
+    start, columns = calendar_table(days.min(), days.max()) if len(days) else calendar_table(0, 0)
+    rows = days - start
+    result = {}
+    for name in features:
+        if name == 'hour':
+            result[name] = (hours - days * 24).astype(np.int8)
+        elif isinstance(columns[name], pd.Categorical):
+            result[name] = pd.Categorical.from_codes(columns[name].codes[rows], dtype=columns[name].dtype)
+        else:
+            result[name] = columns[name][rows]
+    if index is None:
+        index = ds if isinstance(ds, pd.Index) else pd.RangeIndex(len(times))
+    return pd.DataFrame(result, index=index)
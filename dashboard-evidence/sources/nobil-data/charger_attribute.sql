@@ -0,0 +1 @@
+SELECT * FROM charger_attribute
\ No newline at end of file
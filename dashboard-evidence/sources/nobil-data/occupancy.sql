@@ -0,0 +1 @@
+SELECT * FROM occupancy
\ No newline at end of file
@@ -0,0 +1 @@
+SELECT * FROM site_attribute
\ No newline at end of file
@@ -0,0 +1 @@
+SELECT * FROM site_hourly
\ No newline at end of file
@@ -0,0 +1,161 @@
+import time
+import numpy as np
+import pandas as pd
+
+# Forecasters share one interface: fit(train_df) with the Prophet columns 'ds' and 'y', returning
+# the forecaster, then predict(future) with a 'ds' column, returning a DataFrame with 'ds' and
+# 'yhat' (plus 'yhat_lower' and 'yhat_upper' when the engine has intervals).
+
+# Prophet hyperparameters of the site forecasts (here rather than in integration_mock_up, so
+# forecasting workers get them without importing plotting and Prophet)
+PROPHET_PARAMS = {'changepoint_prior_scale': 0.05, 'seasonality_mode': 'multiplicative'}
+
+def _slots(ds):
+    """
+    Hour of the week (0 = Monday 00:00) of each timestamp in `ds`.
+    """
+    ds = pd.DatetimeIndex(ds)
+    return np.asarray(ds.dayofweek * 24 + ds.hour)
+
+def _age_weights(ds, half_life_days):
+    """
+    Exponential decay weights: 1 for the latest timestamp, halving every `half_life_days` before it.
+    """
+    ds = pd.DatetimeIndex(ds)
+    age_days = (ds.max() - ds).total_seconds().to_numpy() / 86400
+    return 0.5 ** (age_days / half_life_days)
+
+class ProphetForecaster:
+    """
+    Prophet with `params`, fitted and predicted through the model cache.
+    """
+    name = 'prophet'
+
+    def __init__(self, params=None, init=None):
+        self.params = params or {}
+        self.init = init
+
+    def fit(self, train_df):
+        self.train_df = train_df[['ds', 'y']]
+        return self
+
+    def predict(self, future):
+        import model_cache  # Loads Prophet, only needed by this engine
+        fcst = model_cache.cached_forecast(self.train_df, self.params, future[['ds']], self.init)
+        return fcst[['ds', 'yhat', 'yhat_lower', 'yhat_upper']]
+
+class SeasonalProfileForecaster:
+    """
+    Mean of each hour of the week, weighted by exponential decay so recent weeks count more.
+    Hours of the week without training data get the weighted mean of their hour of the day, or
+    the overall weighted mean.
+    """
+    name = 'profile'
+
+    def __init__(self, half_life_days=28):
+        self.half_life_days = half_life_days
+
+    def fit(self, train_df):
+        slots = _slots(train_df['ds'])
+        weights = _age_weights(train_df['ds'], self.half_life_days)
+        y = train_df['y'].to_numpy(dtype=float)
+
+        week_w = np.bincount(slots, weights=weights, minlength=168)
+        week_wy = np.bincount(slots, weights=weights * y, minlength=168)
+        day_w = week_w.reshape(7, 24).sum(axis=0)
+        day_wy = week_wy.reshape(7, 24).sum(axis=0)
+        overall = week_wy.sum() / week_w.sum()
+
+        day_means = np.where(day_w > 0, day_wy / np.where(day_w > 0, day_w, 1), overall)
+        self.profile = np.where(week_w > 0, week_wy / np.where(week_w > 0, week_w, 1), np.tile(day_means, 7))
+        return self
+
+    def predict(self, future):
+        return pd.DataFrame({'ds': future['ds'].to_numpy(), 'yhat': self.profile[_slots(future['ds'])]})
+
+class RidgeForecaster:
+    """
+    Ridge regression on one-hot calendar features (hour of day, day of week and hour of day on
+    weekends), solved in closed form with NumPy and weighted by exponential decay.
+    """
+    name = 'ridge'
+
+    def __init__(self, alpha=1.0, half_life_days=28):
+        self.alpha = alpha
+        self.half_life_days = half_life_days
+
+    @staticmethod
+    def _design(ds):
+        ds = pd.DatetimeIndex(ds)
+        hour = np.asarray(ds.hour)
+        dayofweek = np.asarray(ds.dayofweek)
+        X = np.zeros((len(ds), 24 + 7 + 24))
+        rows = np.arange(len(ds))
+        X[rows, hour] = 1
+        X[rows, 24 + dayofweek] = 1
+        X[rows, 31 + hour] = dayofweek >= 5
+        return X
+
+    def fit(self, train_df):
+        X = self._design(train_df['ds'])
+        y = train_df['y'].to_numpy(dtype=float)
+        w = _age_weights(train_df['ds'], self.half_life_days)
+        # The intercept is the weighted mean and is not penalized
+        self.intercept = np.average(y, weights=w)
+        Xw = X * w[:, None]
+        self.coef = np.linalg.solve(Xw.T @ X + self.alpha * np.eye(X.shape[1]), Xw.T @ (y - self.intercept))
+        return self
+
+    def predict(self, future):
+        return pd.DataFrame({'ds': future['ds'].to_numpy(),
+                             'yhat': self.intercept + self._design(future['ds']) @ self.coef})
+
+FORECASTERS = {
+    'prophet': ProphetForecaster,
+    'profile': SeasonalProfileForecaster,
+    'ridge': RidgeForecaster,
+}
+BASELINES = ('profile', 'ridge')
+
+def make_forecaster(engine, prophet_params=None, init=None):
+    """
+    Returns an unfitted forecaster by name (a key of FORECASTERS). `prophet_params` and the
+    warm-start `init` only apply to Prophet.
+    """
+    if engine == 'prophet':
+        return ProphetForecaster(prophet_params, init)
+    return FORECASTERS[engine]()
+
+def holdout_scores(train_df, engines=('prophet',) + BASELINES, holdout_days=7, prophet_params=None):
+    """
+    Backtests each engine on the last `holdout_days` of `train_df`: fits on the data before and
+    scores the holdout. Returns a DataFrame indexed by engine with 'mae' and fit+predict 'seconds'.
+    """
+    split = train_df['ds'].max() - pd.Timedelta(days=holdout_days)
+    fit_df = train_df[train_df['ds'] <= split]
+    holdout = train_df[train_df['ds'] > split]
+    rows = []
+    for engine in engines:
+        started = time.perf_counter()
+        fcst = make_forecaster(engine, prophet_params).fit(fit_df).predict(holdout)
+        seconds = time.perf_counter() - started
+        mae = np.abs(fcst['yhat'].to_numpy() - holdout['y'].to_numpy()).mean()
+        rows.append({'engine': engine, 'mae': mae, 'seconds': seconds})
+    return pd.DataFrame(rows).set_index('engine')
+
+def select_forecaster(train_df, holdout_days=7, min_improvement=0.05, prophet_params=None, init=None):
+    """
+    Picks the engine for `train_df`: the best baseline on the holdout backtest, unless Prophet
+    beats it by more than `min_improvement` (relative MAE). Too little data for a holdout
+    selects the profile baseline without fitting Prophet.
+
+    Returns:
+        (forecaster, scores): the unfitted chosen forecaster and the holdout_scores (None if skipped).
+    """
+    if train_df['ds'].max() - train_df['ds'].min() <= pd.Timedelta(days=2 * holdout_days):
+        return make_forecaster('profile'), None
+    scores = holdout_scores(train_df, holdout_days=holdout_days, prophet_params=prophet_params)
+    best_baseline = scores.loc[list(BASELINES), 'mae'].idxmin()
+    if scores.loc['prophet', 'mae'] < scores.loc[best_baseline, 'mae'] * (1 - min_improvement):
+        return make_forecaster('prophet', prophet_params, init), scores
+    return make_forecaster(best_baseline), scores
@@ -1,7 +1,13 @@
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
 import pandas as pd
 from datetime import datetime, timedelta
-from prophet import Prophet
 import process_data
+import model_cache
+import forecasters
+import spot_prices
 import matplotlib.pyplot as plt
 import numpy as np
 from scipy.interpolate import make_interp_spline
@@ -16,42 +22,102 @@ PRICE_INDEX_MIN = 0.6   # Minimum dynamic price index
 PRICE_INDEX_MAX = 1.4   # Maximum dynamic price index
 FORECAST_START_DATE = datetime(2024, 5, 31)   # Start date for forecast simulation
 SIMULATION_END_DATE = datetime(2024, 9, 30)    # End date for simulation
+PROPHET_PARAMS = forecasters.PROPHET_PARAMS
+FORECAST_WORKERS = os.cpu_count() or 1   # Processes used to fit the day-ahead models in parallel
 
 # Load full hourly data from file and ensure 'Start time' is datetime
 def load_full_data():
     print("Loading full data from file...")
-    data = process_data.get_data().reset_index()
+    data = spot_prices.join_spot_prices(process_data.get_data()).reset_index()
     data['Start time'] = pd.to_datetime(data['Start time'])
     print("Full data loaded. Total records:", len(data))
     return data
 
-# Scale y between scalemin and scalemax based on [ymin, ymax] (returns midpoint if no variation)
+# Scale y between scalemin and scalemax based on [ymin, ymax] (returns midpoint if no variation).
+# Works on scalars and element-wise on arrays.
 def linear_scale_value(y, ymin, ymax, scalemin=PRICE_INDEX_MIN, scalemax=PRICE_INDEX_MAX):
-    if ymax == ymin:
-        return (scalemin + scalemax) / 2
-    return (y - ymin) / (ymax - ymin) * (scalemax - scalemin) + scalemin
-
-# Compute hourly price index using a 24h rolling window on forecasted 'yhat'
-def compute_hourly_price_index(fcst_day, scalemin=PRICE_INDEX_MIN, scalemax=PRICE_INDEX_MAX):
-    df = fcst_day[['ds', 'yhat']].copy().set_index('ds')
-    rolling = df.rolling('24h', center=True)
-    df['ymin'] = rolling['yhat'].min()  # Rolling min of yhat
-    df['ymax'] = rolling['yhat'].max()  # Rolling max of yhat
-    df = df.reset_index()
-    df['price_index'] = df.apply(lambda r: linear_scale_value(r['yhat'], r['ymin'], r['ymax'], scalemin, scalemax), axis=1)
-    return df[['ds', 'price_index']]
+    y, ymin, ymax = np.asarray(y, dtype=float), np.asarray(ymin, dtype=float), np.asarray(ymax, dtype=float)
+    flat = ymax == ymin
+    span = np.where(flat, 1.0, ymax - ymin)
+    scaled = np.where(flat, (scalemin + scalemax) / 2, (y - ymin) / span * (scalemax - scalemin) + scalemin)
+    return scaled if scaled.ndim else float(scaled)
 
-# Forecast next 24h using training_data and return hourly forecast and daily aggregates
-def forecast_one_day(training_data, forecast_date, scalemin=PRICE_INDEX_MIN, scalemax=PRICE_INDEX_MAX):
-    print(f"\nForecasting for day starting at {forecast_date} ...")
+# Centered rolling min and max of `values` over a time window, computed independently per group.
+# Matches pandas' rolling(window, center=True): the window of time t is (t - window/2, t + window/2].
+# Works on shifted copies of the (group, time)-sorted arrays, one shift per row in the window.
+def rolling_min_max(ds, values, groups=None, window='24h'):
+    t = pd.to_datetime(pd.Series(ds)).to_numpy(dtype='datetime64[ns]').view('int64')
+    v = np.asarray(values, dtype=float)
+    g = np.zeros(len(t), dtype=np.int64) if groups is None else pd.factorize(np.asarray(groups))[0]
+    half = pd.Timedelta(window).value // 2
+
+    order = np.lexsort((t, g))
+    t, v, g = t[order], v[order], g[order]
+    ymin, ymax = v.copy(), v.copy()
+    k = 1
+    while k < len(t):
+        same_group = g[k:] == g[:-k]
+        gap = t[k:] - t[:-k]
+        ahead = same_group & (gap <= half)  # row i + k is inside the window of row i
+        if not ahead.any():
+            break
+        behind = same_group & (gap < half)  # row i is inside the window of row i + k
+        ymin[:-k] = np.where(ahead, np.minimum(ymin[:-k], v[k:]), ymin[:-k])
+        ymax[:-k] = np.where(ahead, np.maximum(ymax[:-k], v[k:]), ymax[:-k])
+        ymin[k:] = np.where(behind, np.minimum(ymin[k:], v[:-k]), ymin[k:])
+        ymax[k:] = np.where(behind, np.maximum(ymax[k:], v[:-k]), ymax[k:])
+        k += 1
+
+    result_min, result_max = np.empty_like(ymin), np.empty_like(ymax)
+    result_min[order], result_max[order] = ymin, ymax
+    return result_min, result_max
+
+# Compute hourly price index using a 24h rolling window on forecasted 'yhat'.
+# A batch of forecasts (many days or sites) is priced in one call by passing the column(s)
+# that identify each forecast as `by`; windows never cross forecasts.
+def compute_hourly_price_index(fcst_day, scalemin=PRICE_INDEX_MIN, scalemax=PRICE_INDEX_MAX, by=None):
+    by = [] if by is None else [by] if isinstance(by, str) else list(by)
+    df = fcst_day[['ds', *by, 'yhat']].reset_index(drop=True)
+    groups = df.groupby(by, sort=False).ngroup() if by else None
+    ymin, ymax = rolling_min_max(df['ds'], df['yhat'], groups)
+    df['price_index'] = linear_scale_value(df['yhat'].to_numpy(), ymin, ymax, scalemin, scalemax)
+    return df[['ds', *by, 'price_index']]
+
+# Fit a Prophet model on training_data, optionally warm-started from init (see stan_init).
+# Fitted models are cached on disk, keyed by training data and hyperparameters (see model_cache).
+def fit_model(training_data, init=None):
     train_df = training_data.rename(columns={'Start time': 'ds', 'Energy_Wh': 'y'})
     print("Training Prophet model on data up to", train_df['ds'].max())
-    model = Prophet(changepoint_prior_scale=0.05, seasonality_mode='multiplicative')
-    model.fit(train_df)
-    future = model.make_future_dataframe(periods=24, freq='h')
-    fcst = model.predict(future)
+    return model_cache.fit_prophet(train_df, PROPHET_PARAMS, init)
+
+# Hourly dates of the `hours` hours following the end of training_data
+def future_hours(training_data, hours):
+    last = training_data['Start time'].max()
+    return pd.DataFrame({'ds': pd.date_range(last, periods=hours + 1, freq='h')[1:]})
+
+# Fitted parameters of a model, used to initialize the optimization of the next fit (warm start)
+def stan_init(model):
+    res = {}
+    for pname in ['k', 'm', 'sigma_obs']:
+        res[pname] = model.params[pname][0][0]
+    for pname in ['delta', 'beta']:
+        res[pname] = model.params[pname][0]
+    return res
+
+# Fit Prophet on training_data and return its forecast for the 24h starting at forecast_date.
+# Forecasts are cached on disk, so a cache hit skips fitting entirely.
+def fit_predict_day(training_data, forecast_date):
+    train_df = training_data.rename(columns={'Start time': 'ds', 'Energy_Wh': 'y'})
+    print("Training Prophet model on data up to", train_df['ds'].max())
+    fcst = model_cache.cached_forecast(train_df, PROPHET_PARAMS, future_hours(training_data, 24))
     fcst_day = fcst[(fcst['ds'] >= forecast_date) & (fcst['ds'] < forecast_date + timedelta(days=1))].copy()
     print(f"Forecast generated for {len(fcst_day)} hours.")
+    return fcst_day
+
+# Forecast next 24h using training_data and return hourly forecast and daily aggregates
+def forecast_one_day(training_data, forecast_date, scalemin=PRICE_INDEX_MIN, scalemax=PRICE_INDEX_MAX):
+    print(f"\nForecasting for day starting at {forecast_date} ...")
+    fcst_day = fit_predict_day(training_data, forecast_date)
     price_index_df = compute_hourly_price_index(fcst_day, scalemin, scalemax)
     fcst_day = fcst_day.merge(price_index_df, on='ds')
     fcst_day['predicted_revenue'] = fcst_day['yhat'] * BASE_PRICE * fcst_day['price_index']
@@ -61,55 +127,185 @@ def forecast_one_day(training_data, forecast_date, scalemin=PRICE_INDEX_MIN, sca
     print(f"Aggregated daily forecast: Energy={forecasted_energy:.2f}, Revenue={predicted_revenue:.2f}")
     return fcst_day, daily_forecast
 
-# Simulate day-ahead forecasting: for each day, forecast next 24h, compare with actual, and compute dynamic revenue
-def simulate_forecast(forecast_start_date, simulation_end_date, scalemin=PRICE_INDEX_MIN, scalemax=PRICE_INDEX_MAX, price_elasticity=PRICE_ELASTICITY):
-    print("\nStarting simulation of day-ahead forecasts...")
-    full_data = load_full_data()
+# Days to forecast in a backtest: from the day after forecast_start_date while actual data exists
+def backtest_dates(full_data, forecast_start_date, simulation_end_date):
     current_date = forecast_start_date + timedelta(days=1)
-    results = []
     max_test_date = full_data['Start time'].dt.date.max()
-    
+    dates = []
     while current_date.date() <= max_test_date and current_date <= simulation_end_date:
-        print("\n========================================")
-        print("Processing forecast for day:", current_date.date())
-        training_data = full_data[full_data['Start time'] < current_date].copy()
-        print(f"Training data now includes records up to {training_data['Start time'].max()}")
-        fcst_day, daily_forecast = forecast_one_day(training_data, current_date, scalemin, scalemax)
-        
-        # Get actual hourly data for the forecasted day
-        actual_next_day = full_data[(full_data['Start time'] >= current_date) & (full_data['Start time'] < current_date + timedelta(days=1))].copy()
-        actual_energy = actual_next_day['Energy_Wh'].sum() if not actual_next_day.empty else None
-        actual_revenue = actual_energy * BASE_PRICE
-        
-        # Merge actual hourly data with forecasted price indices to compute dynamic revenue per hour
-        actual_next_day = actual_next_day.rename(columns={'Start time': 'ds', 'Energy_Wh': 'actual_energy'})
-        merged_actual = fcst_day[['ds', 'price_index']].merge(actual_next_day[['ds', 'actual_energy']], on='ds', how='inner')
-        merged_actual['volume_delta'] = (merged_actual['price_index'] - 1) * merged_actual['actual_energy'] * price_elasticity
-        merged_actual['revenue_with_dynamic_price'] = (merged_actual['actual_energy'] - merged_actual['volume_delta']) * BASE_PRICE * merged_actual['price_index']
-        revenue_with_dynamic_price = merged_actual['revenue_with_dynamic_price'].sum()
-        #plot hourly
-        #plot_merged_revenue(merged_actual)
-    
-        # Compute percentage difference using revenue with dynamic price vs actual revenue
-        pct_diff = round((revenue_with_dynamic_price - actual_revenue) / actual_revenue, 2) if actual_revenue and actual_revenue != 0 else None
-        
-        print(f"Day {current_date.date()}: Forecasted Energy = {daily_forecast['forecasted_energy']:.2f}, Predicted Revenue = {daily_forecast['predicted_revenue']:.2f}")
-        print(f"Day {current_date.date()}: Actual Energy = {actual_energy}, Actual Revenue = {actual_revenue}")
-        print(f"Day {current_date.date()}: Revenue with dynamic price = {revenue_with_dynamic_price:.2f}")
-        print(f"Percentage Difference (Revenue): {pct_diff}")
-        
-        results.append({
-            'date': current_date.date(),
-            'forecasted_energy': daily_forecast['forecasted_energy'],
-            'predicted_revenue': daily_forecast['predicted_revenue'],
-            'actual_energy': actual_energy,
-            'actual_revenue': actual_revenue,
-            'revenue_with_dynamic_price': revenue_with_dynamic_price,
-            'pct_diff': pct_diff
-        })
+        dates.append(current_date)
         current_date += timedelta(days=1)
-    
-    results_df = pd.DataFrame(results)
+    return dates
+
+# Fit on all data before the first of `dates` and return the day-ahead 'yhat' for each of the dates,
+# predicting forward with the same model. `engine` is a forecaster name (see forecasters.FORECASTERS)
+# or 'auto' to use Prophet only where it beats the fast baselines on a holdout of the training data.
+# Prophet forecasts come from the on-disk cache when available; the fitted Prophet model is only
+# returned (for warm starts) when need_model is set.
+def forecast_block(full_data, dates, init=None, need_model=False, engine='prophet'):
+    print("\n========================================")
+    print("Processing forecast for days:", ", ".join(str(d.date()) for d in dates))
+    training_data = full_data[full_data['Start time'] < dates[0]].copy()
+    train_df = training_data.rename(columns={'Start time': 'ds', 'Energy_Wh': 'y'})
+    if engine == 'auto':
+        forecaster, _ = forecasters.select_forecaster(train_df, prophet_params=PROPHET_PARAMS, init=init)
+    else:
+        forecaster = forecasters.make_forecaster(engine, PROPHET_PARAMS, init)
+    print(f"Training {forecaster.name} model on data up to", train_df['ds'].max())
+    fcst = forecaster.fit(train_df).predict(future_hours(training_data, 24 * len(dates)))
+    fcst = fcst[['ds', 'yhat']]
+    forecasts = []
+    for current_date in dates:
+        fcst_day = fcst[(fcst['ds'] >= current_date) & (fcst['ds'] < current_date + timedelta(days=1))].copy()
+        fcst_day['date'] = current_date.date()
+        forecasts.append(fcst_day)
+    print(f"Forecast generated for {sum(len(f) for f in forecasts)} hours.")
+    model = fit_model(training_data, init) if need_model and forecaster.name == 'prophet' else None
+    return pd.concat(forecasts, ignore_index=True), model
+
+# Hourly data shared with forecast worker processes, loaded once per worker from memory-mapped files
+_worker_data = None
+
+def _init_forecast_worker(data_dir):
+    global _worker_data
+    start = np.load(os.path.join(data_dir, 'start_time.npy'), mmap_mode='r')
+    energy = np.load(os.path.join(data_dir, 'energy_wh.npy'), mmap_mode='r')
+    _worker_data = pd.DataFrame({'Start time': start, 'Energy_Wh': energy})
+
+def _forecast_block_worker(dates, engine):
+    return forecast_block(_worker_data, dates, engine=engine)[0]
+
+# Forecast stage: for each day, fit on all data before it and keep the day-ahead 'yhat'.
+# The forecasts do not depend on the pricing parameters, so they are computed once and reused.
+#   - refit_every: refit the model every N days and predict forward with it in between.
+#   - warm_start: initialize each Prophet fit from the previous Prophet fit's parameters. Fits then
+#     depend on each other and run serially.
+#   - engine: the forecaster of each block, see forecast_block.
+# Otherwise the fits are independent and run in parallel on `workers` processes; the hourly data
+# is written once to memory-mapped files instead of being pickled for every fit.
+def forecast_days(full_data, forecast_start_date, simulation_end_date, workers=FORECAST_WORKERS,
+                  warm_start=False, refit_every=1, engine='prophet'):
+    print("\nStarting day-ahead forecasts...")
+    dates = backtest_dates(full_data, forecast_start_date, simulation_end_date)
+    blocks = [dates[i:i + refit_every] for i in range(0, len(dates), refit_every)]
+
+    if warm_start:
+        forecasts, init = [], None
+        for block in blocks:
+            fcst, model = forecast_block(full_data, block, init, need_model=True, engine=engine)
+            forecasts.append(fcst)
+            if model is not None:
+                init = stan_init(model)
+    elif workers <= 1 or len(blocks) <= 1:
+        forecasts = [forecast_block(full_data, block, engine=engine)[0] for block in blocks]
+    else:
+        with tempfile.TemporaryDirectory() as data_dir:
+            np.save(os.path.join(data_dir, 'start_time.npy'), full_data['Start time'].to_numpy(dtype='datetime64[ns]'))
+            np.save(os.path.join(data_dir, 'energy_wh.npy'), full_data['Energy_Wh'].to_numpy(dtype=float))
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_forecast_worker,
+                                     initargs=(data_dir,)) as pool:
+                # map returns results in date order regardless of completion order
+                forecasts = list(pool.map(_forecast_block_worker, blocks, [engine] * len(blocks)))
+
+    print("\nForecasts completed.")
+    return pd.concat(forecasts, ignore_index=True)
+
+# Compare training modes of the forecast stage on the same backtest: wall-clock time against
+# hourly forecast accuracy (MAE on hours with actual data, MAPE on hours with non-zero energy)
+def compare_training_modes(full_data, forecast_start_date, simulation_end_date, workers=FORECAST_WORKERS,
+                           modes=({'warm_start': False, 'refit_every': 1},
+                                  {'warm_start': True, 'refit_every': 1},
+                                  {'warm_start': False, 'refit_every': 7},
+                                  {'warm_start': True, 'refit_every': 7},
+                                  {'engine': 'profile'},
+                                  {'engine': 'ridge'},
+                                  {'engine': 'auto'})):
+    actual = full_data.rename(columns={'Start time': 'ds', 'Energy_Wh': 'actual_energy'})
+    rows = []
+    for mode in modes:
+        started = time.perf_counter()
+        forecasts = forecast_days(full_data, forecast_start_date, simulation_end_date, workers, **mode)
+        seconds = time.perf_counter() - started
+        merged = forecasts.merge(actual, on='ds', how='inner')
+        error = (merged['yhat'] - merged['actual_energy']).abs()
+        nonzero = merged['actual_energy'] > 0
+        rows.append({**mode, 'seconds': seconds, 'mae': error.mean(),
+                     'mape': (error[nonzero] / merged.loc[nonzero, 'actual_energy']).mean() * 100})
+    report = pd.DataFrame(rows).fillna({'engine': 'prophet'})
+    print("\nTraining modes: speed vs accuracy")
+    print(report.to_string(index=False))
+    return report
+
+# Position of each forecast hour within its day's 24h rolling [min, max] window (0.5 if the window
+# is flat), and whether the window is flat. The price index of a scenario is scalemin plus the
+# position times (scalemax - scalemin), so positions are computed once for all scenarios.
+def price_positions(forecasts):
+    ymin, ymax = rolling_min_max(forecasts['ds'], forecasts['yhat'], forecasts['date'])
+    yhat = forecasts['yhat'].to_numpy()
+    flat = ymax == ymin
+    position = np.where(flat, 0.5, (yhat - ymin) / np.where(flat, 1, ymax - ymin))
+    return position, flat
+
+# Scenario stage: apply any number of (scalemin, scalemax, price_elasticity) scenarios to the stored
+# forecasts at once, and compare with actual data. Returns one daily results DataFrame per scenario.
+def evaluate_scenarios(forecasts, full_data, scenarios):
+    scalemin, scalemax, elasticity = (np.array(v, dtype=float) for v in zip(*scenarios))
+
+    hours = forecasts.copy()
+    position, flat = price_positions(hours)
+
+    # Hourly price index for every scenario (hours x scenarios)
+    price_index = position[:, None] * (scalemax - scalemin) + scalemin
+    price_index[flat] = (scalemin + scalemax) / 2
+    predicted_revenue = hours['yhat'].to_numpy()[:, None] * BASE_PRICE * price_index
+
+    # Revenue with dynamic price on the hours with actual data
+    actual = full_data.rename(columns={'Start time': 'ds', 'Energy_Wh': 'actual_energy'})
+    actual_energy = hours[['ds']].merge(actual[['ds', 'actual_energy']], on='ds', how='left')['actual_energy'].to_numpy()
+    has_actual = ~np.isnan(actual_energy)
+    volume_delta = (price_index - 1) * actual_energy[:, None] * elasticity
+    dynamic_revenue = np.where(has_actual[:, None], (actual_energy[:, None] - volume_delta) * BASE_PRICE * price_index, 0)
+
+    # Daily aggregates, shared by all scenarios (actual energy covers the whole day, not only forecasted hours)
+    days = hours['date'].to_numpy()
+    daily = hours.groupby('date', sort=False)[['yhat']].sum().rename(columns={'yhat': 'forecasted_energy'})
+    daily_actual = actual.groupby(actual['ds'].dt.date)['actual_energy'].sum()
+    daily['actual_energy'] = daily_actual.reindex(daily.index)
+    daily['actual_revenue'] = daily['actual_energy'] * BASE_PRICE
+    if 'Spot_price_SEK_kWh' in full_data:
+        # What the actual energy would have cost at the spot price, applied like BASE_PRICE
+        spot_cost = full_data['Energy_Wh'] * full_data['Spot_price_SEK_kWh']
+        daily['actual_spot_cost'] = spot_cost.groupby(actual['ds'].dt.date).sum().reindex(daily.index)
+    predicted_daily = pd.DataFrame(predicted_revenue).groupby(days, sort=False).sum()
+    dynamic_daily = pd.DataFrame(dynamic_revenue).groupby(days, sort=False).sum()
+
+    results = []
+    for i, (smin, smax, e) in enumerate(scenarios):
+        results_df = pd.DataFrame({
+            'date': daily.index,
+            'forecasted_energy': daily['forecasted_energy'].to_numpy(),
+            'predicted_revenue': predicted_daily[i].to_numpy(),
+            'actual_energy': daily['actual_energy'].to_numpy(),
+            'actual_revenue': daily['actual_revenue'].to_numpy(),
+            'revenue_with_dynamic_price': dynamic_daily[i].to_numpy(),
+        })
+        if 'actual_spot_cost' in daily:
+            results_df['actual_spot_cost'] = daily['actual_spot_cost'].to_numpy()
+        pct_diff = (results_df['revenue_with_dynamic_price'] - results_df['actual_revenue']) / results_df['actual_revenue']
+        results_df['pct_diff'] = pct_diff.where(results_df['actual_revenue'] > 0).round(2)
+        print(f"Scenario scalemin={smin}, scalemax={smax}, elasticity={e}: "
+              f"Actual Revenue = {results_df['actual_revenue'].sum():.2f}, "
+              f"Revenue with dynamic price = {results_df['revenue_with_dynamic_price'].sum():.2f}")
+        results.append(results_df)
+    return results
+
+# Simulate day-ahead forecasting: for each day, forecast next 24h, compare with actual, and compute dynamic revenue
+def simulate_forecast(forecast_start_date, simulation_end_date, scalemin=PRICE_INDEX_MIN, scalemax=PRICE_INDEX_MAX, price_elasticity=PRICE_ELASTICITY, workers=FORECAST_WORKERS,
+                      warm_start=False, refit_every=1):
+    print("\nStarting simulation of day-ahead forecasts...")
+    full_data = load_full_data()
+    forecasts = forecast_days(full_data, forecast_start_date, simulation_end_date, workers, warm_start, refit_every)
+    results_df = evaluate_scenarios(forecasts, full_data, [(scalemin, scalemax, price_elasticity)])[0]
     print("\nSimulation completed.")
     return results_df
 
@@ -245,26 +441,23 @@ if __name__ == '__main__':
      # Define forecast period (assumed already defined as global variables)
     # FORECAST_START_DATE and SIMULATION_END_DATE should be defined globally.
 
+    # The day-ahead forecasts do not depend on the pricing scenario, so they are computed once
+    # and every scenario is evaluated on the same stored forecasts.
+    full_data = load_full_data()
+    forecasts = forecast_days(full_data, FORECAST_START_DATE, SIMULATION_END_DATE)
+
     # --- Low-Risk Scenario ---
     # For a conservative scenario, we use a slightly higher minimum,
     # lower maximum, and lower elasticity.
     low_scalemin =  0.9   # e.g. increasing the minimum index
     low_scalemax = 1.2   # e.g. decreasing the maximum index
     low_elasticity = 0.1  # lower responsiveness
-    low_df = simulate_forecast(FORECAST_START_DATE, SIMULATION_END_DATE,
-                               scalemin=low_scalemin,
-                               scalemax=low_scalemax,
-                               price_elasticity=low_elasticity)
     
     # --- Medium-Risk Scenario (Default) ---
     
     med_scalemin = 0.8   # e.g. increasing the minimum index
     med_scalemax = 1.4   # e.g. decreasing the maximum index
     med_elasticity = 0.07  # lower responsiveness
-    med_df = simulate_forecast(FORECAST_START_DATE, SIMULATION_END_DATE,
-                               scalemin=med_scalemin,
-                               scalemax=med_scalemax,
-                               price_elasticity=med_elasticity)
     
     # --- High-Risk Scenario ---
     # For an aggressive scenario, we use a lower minimum,
@@ -272,10 +465,12 @@ if __name__ == '__main__':
     high_scalemin = 0.7   # lower minimum index
     high_scalemax = 1.7     # higher maximum index
     high_elasticity = 0.01  # higher responsiveness
-    high_df = simulate_forecast(FORECAST_START_DATE, SIMULATION_END_DATE,
-                                scalemin=high_scalemin,
-                                scalemax=high_scalemax,
-                                price_elasticity=high_elasticity)
+
+    low_df, med_df, high_df = evaluate_scenarios(forecasts, full_data, [
+        (low_scalemin, low_scalemax, low_elasticity),
+        (med_scalemin, med_scalemax, med_elasticity),
+        (high_scalemin, high_scalemax, high_elasticity),
+    ])
     # 
     # Now pass the three DataFrames to our monthly plotting function
     plot_monthly_revenue_scenarios_stacked(low_df, med_df, high_df)
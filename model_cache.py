@@ -0,0 +1,156 @@
+import argparse
+import hashlib
+import json
+import os
+import numpy as np
+import pandas as pd
+from prophet import Prophet
+from prophet.serialize import model_to_json, model_from_json
+
+CACHE_DIR = os.path.join("data", "cache", "models")
+MAX_CACHE_BYTES = 512 * 2**20  # Least recently used entries are evicted above this size
+
+def _hash_frame(df):
+    """
+    Returns a SHA-256 hex digest of a DataFrame's values (the index is ignored).
+    """
+    return hashlib.sha256(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes()).hexdigest()
+
+def model_key(train_df, params, init=None):
+    """
+    Content address of a fitted model: the training-data cutoff, a hash of the training data
+    ('ds' and 'y'), the Prophet hyperparameters and, for warm-started fits, the initial values.
+    """
+    payload = {
+        "cutoff": str(train_df["ds"].max()),
+        "data": _hash_frame(train_df[["ds", "y"]]),
+        "params": params,
+        "init": init,
+    }
+    encoded = json.dumps(payload, sort_keys=True, default=lambda o: np.asarray(o).tolist())
+    return hashlib.sha256(encoded.encode()).hexdigest()[:32]
+
+def _touch(path):
+    """
+    Marks a cache entry as recently used.
+    """
+    os.utime(path)
+
+def _write_atomic(path, write):
+    """
+    Calls `write` with a temporary path next to `path` and then renames the result into place,
+    so an interrupted write never leaves a partial entry under the final name.
+    """
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        write(tmp_path)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+def _entries(cache_dir=CACHE_DIR):
+    """
+    Lists cache entries as (path, size in bytes, last used time), least recently used first.
+    Temporary files of writes in progress are skipped.
+    """
+    if not os.path.isdir(cache_dir):
+        return []
+    entries = []
+    for name in os.listdir(cache_dir):
+        if name.endswith(".tmp"):
+            continue
+        path = os.path.join(cache_dir, name)
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            # Removed by another process (e.g. a pool worker evicting) since listdir
+            continue
+        entries.append((path, stat.st_size, stat.st_mtime))
+    return sorted(entries, key=lambda e: e[2])
+
+def evict(max_bytes=MAX_CACHE_BYTES, cache_dir=CACHE_DIR):
+    """
+    Removes least recently used entries until the cache holds at most `max_bytes`.
+    Returns the number of removed entries.
+    """
+    entries = _entries(cache_dir)
+    total = sum(size for _, size, _ in entries)
+    removed = 0
+    for path, size, _ in entries:
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+            removed += 1
+        except FileNotFoundError:
+            pass
+        total -= size
+    return removed
+
+def fit_prophet(train_df, params, init=None, cache_dir=CACHE_DIR):
+    """
+    Returns a Prophet model with `params` fitted on `train_df` ('ds', 'y'), loading it from the
+    cache when the same model was fitted before. `init` warm-starts the optimization.
+    """
+    key = model_key(train_df, params, init)
+    path = os.path.join(cache_dir, f"{key}.model.json")
+    try:
+        _touch(path)
+        with open(path, "r", encoding="utf-8") as f:
+            return model_from_json(f.read())
+    except FileNotFoundError:
+        pass
+
+    model = Prophet(**params)
+    if init is None:
+        model.fit(train_df)
+    else:
+        model.fit(train_df, init=init)
+
+    def write(tmp_path):
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(model_to_json(model))
+
+    os.makedirs(cache_dir, exist_ok=True)
+    _write_atomic(path, write)
+    evict(cache_dir=cache_dir)
+    return model
+
+def cached_forecast(train_df, params, future, init=None, cache_dir=CACHE_DIR):
+    """
+    Returns the forecast of the model fitted on `train_df` for the dates in `future`.
+    On a cache hit the stored forecast is returned without fitting or loading the model.
+    """
+    key = hashlib.sha256((model_key(train_df, params, init) + _hash_frame(future[["ds"]])).encode()).hexdigest()[:32]
+    path = os.path.join(cache_dir, f"{key}.forecast.parquet")
+    try:
+        _touch(path)
+        return pd.read_parquet(path)
+    except FileNotFoundError:
+        pass
+
+    model = fit_prophet(train_df, params, init, cache_dir)
+    fcst = model.predict(future)
+    os.makedirs(cache_dir, exist_ok=True)
+    _write_atomic(path, fcst.to_parquet)
+    evict(cache_dir=cache_dir)
+    return fcst
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inspect or purge the Prophet model and forecast cache.")
+    parser.add_argument("command", choices=["info", "purge"])
+    parser.add_argument("--max-mb", type=float, default=0,
+                        help="With purge: keep the most recently used entries up to this size")
+    args = parser.parse_args()
+
+    if args.command == "info":
+        entries = _entries()
+        models = sum(1 for path, _, _ in entries if path.endswith(".model.json"))
+        total = sum(size for _, size, _ in entries)
+        print(f"Cache directory: {CACHE_DIR}")
+        print(f"Models: {models}, forecasts: {len(entries) - models}, size: {total / 2**20:.1f} MB "
+              f"(limit {MAX_CACHE_BYTES / 2**20:.0f} MB)")
+    else:
+        removed = evict(int(args.max_mb * 2**20))
+        print(f"Removed {removed} cache entries.")
@@ -1,238 +1,1119 @@
+import argparse
+import glob
+import gzip
+import shutil
 import tarfile
+import zlib
+import time
+import numpy as np
 import pandas as pd
+import pyarrow as pa
 import duckdb
 import json
 import os
-from collections import defaultdict
+import re
+from functools import partial
+from multiprocessing import Pool
+from typing import NamedTuple
+
+try:
+    import orjson
+    _json_loads = orjson.loads
+except ImportError:  # orjson is optional, json.loads is used when it is not installed
+    _json_loads = json.loads
 
 # ------------------------
 # Configuration
 # ------------------------
 
 TAR_PATH = os.path.join("data2", "2025-05-26.tar.gz")
+TAR_GLOB = os.path.join("data2", "*.tar.gz")
 METADATA_PATH = os.path.join("data2", "NOBILdump_SWE_forever-2025-06-03.json")
-# Duckdb connection
-con = duckdb.connect("database.db")
+# Duckdb database file
+DB_PATH = "database.db"
+# Rows per Arrow record batch when loading into DuckDB
+ARROW_BATCH_ROWS = 1_000_000
+# Status ingest: parsing worker processes and number of archive members per parsing batch
+INGEST_WORKERS = os.cpu_count() or 1
+INGEST_BATCH_FILES = 5000
+# Metadata ingest: stations per record batch and characters read from the dump at a time
+METADATA_BATCH_STATIONS = 2000
+METADATA_BLOCK_BYTES = 2**20
 
 # ------------------------
 # Data Loading & Parsing
 # ------------------------
 
-def load_charger_statuses(tar_path, read_first=None):
+class StatusSample(NamedTuple):
+    """
+    Options for reading only part of a status archive during development (all optional):
+    - max_files: stop after reading this many data/ files
+    - max_bytes: stop after reading this many bytes of raw JSON
+    - time_window: (start, end) in epoch seconds; keeps events with start <= timestamp < end
+    - charger_fraction: keeps only chargers whose (nobilId, evseUid) hash falls in this
+      fraction, so sampled chargers keep all their events and sessions stay complete
     """
-    Streams and parses a .tar.gz file containing JSON timeseries data,
-    grouping by (nobilId, evseUid) and sorting each group's entries by timestamp.
+    max_files: int = None
+    max_bytes: int = None
+    time_window: tuple = None
+    charger_fraction: float = None
 
-    Returns:
-        dict: {
-            (nobilId, evseUid): [(timestamp, status), ...],
-            ...
-        }
+def charger_hash(site_id, charger_id):
     """
-    charger_logs = defaultdict(list)
+    Stable 32-bit hash of a charger key, used for charger sampling (same value in every process).
+    """
+    return zlib.crc32(f"{site_id}\x1f{charger_id}".encode("utf-8"))
 
-    print(f"[INFO] Opening tar file: {tar_path}")
+def _as_timestamp(value):
+    """
+    Returns a status timestamp (epoch seconds) as an int that fits in int64; raises ValueError
+    for anything else, such as strings or fractional seconds.
+    """
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    if isinstance(value, bool) or not isinstance(value, int) or not -2**63 <= value < 2**63:
+        raise ValueError(f"invalid timestamp {value!r}")
+    return value
+
+def _index_paths(tar_path):
+    """
+    Returns the paths of the uncompressed sidecar archive and the member index of a .tar.gz.
+    """
+    base = tar_path[:-3] if tar_path.endswith(".gz") else tar_path + ".raw"
+    return base, tar_path + ".index.npz"
+
+def _archive_signature(tar_path):
+    """
+    Size and modification time (ns) of an archive, stored in its member index to detect a
+    replaced or re-downloaded archive.
+    """
+    stat = os.stat(tar_path)
+    return np.array([stat.st_size, stat.st_mtime_ns], dtype=np.int64)
+
+def _index_is_current(tar_path):
+    """
+    True when the archive has a member index and sidecar built from its current version
+    (same size and modification time, and a sidecar of the indexed size).
+    """
+    raw_path, index_path = _index_paths(tar_path)
+    if not (os.path.exists(index_path) and os.path.exists(raw_path)):
+        return False
+    with np.load(index_path) as index:
+        if "archive_signature" not in index or "raw_size" not in index:
+            return False
+        return (np.array_equal(index["archive_signature"], _archive_signature(tar_path))
+                and int(index["raw_size"]) == os.path.getsize(raw_path))
+
+def _iter_member_batches(tar_path, batch_files, sample):
+    """
+    Streams the gzip-compressed tar archive and yields batches of (member name, raw bytes)
+    for the JSON files under data/. Only reading and decompression happen here.
+    Stops once the sample's max_files or max_bytes is reached.
+    """
+    batch = []
+    n_files, n_bytes = 0, 0
     with tarfile.open(tar_path, mode="r:gz") as tar:
-        print(f"[INFO] Streaming archive contents...")
-        for i, member in enumerate(tar):
+        for member in tar:
             if not member.isfile() or not member.name.startswith("data/"):
                 continue
             # For reading only a part of the data
-            if read_first is not None and i > read_first:
+            if sample.max_files is not None and n_files >= sample.max_files:
+                break
+            if sample.max_bytes is not None and n_bytes + member.size > sample.max_bytes:
                 break
 
             f = tar.extractfile(member)
             if f is not None:
-                try:
-                    content = f.read().decode("utf-8")
-                    entry = json.loads(content)
+                batch.append((member.name, f.read()))
+                n_files += 1
+                n_bytes += member.size
+            if len(batch) >= batch_files:
+                yield batch
+                batch = []
+                # TarFile keeps every member header it has read; streaming never needs them again
+                tar.members = []
+    if batch:
+        yield batch
+
+def _iter_indexed_batches(tar_path, batch_files, sample):
+    """
+    Yields batches of (member name, raw bytes) using the member index (see build_member_index):
+    members outside the sample's time window or charger fraction are skipped without being read,
+    and the rest are read straight from their offsets in the uncompressed sidecar archive.
+    """
+    raw_path, index_path = _index_paths(tar_path)
+    index = np.load(index_path)
+    keep = index["timestamp"] >= 0
+    if sample.time_window is not None:
+        keep &= (index["timestamp"] >= sample.time_window[0]) & (index["timestamp"] < sample.time_window[1])
+    if sample.charger_fraction is not None:
+        keep &= index["charger_hash"] < sample.charger_fraction * 2**32
+    selected = np.flatnonzero(keep)
+    if sample.max_files is not None:
+        selected = selected[:sample.max_files]
+    if sample.max_bytes is not None:
+        selected = selected[np.cumsum(index["size"][selected]) <= sample.max_bytes]
+
+    yield from _read_members(raw_path, index["name"][selected], index["offset"][selected],
+                             index["size"][selected], batch_files)
+
+def _read_members(raw_path, names, offsets, sizes, batch_files):
+    """
+    Yields batches of (member name, raw bytes) read at the given offsets of an uncompressed tar.
+    """
+    with open(raw_path, "rb") as f:
+        for start in range(0, len(names), batch_files):
+            batch = []
+            for name, offset, size in zip(names[start:start + batch_files], offsets[start:start + batch_files],
+                                          sizes[start:start + batch_files]):
+                f.seek(offset)
+                batch.append((str(name), f.read(size)))
+            yield batch
+
+def _parse_member_batch(batch, sample=StatusSample()):
+    """
+    Decodes a batch of raw JSON status files into dictionary-encoded columns, so only one
+    Python string per distinct charger and status is kept (and sent back from a worker).
+    Files missing one of nobilId, evseUid, status or timestamp are skipped, as are events
+    outside the sample's time window or charger fraction.
+
+    Returns:
+        (columns, number of files, number of raw bytes, list of error messages), where columns is a dict of
+        per-event arrays charger (int32) and status (uint8), codes into the batch's site_ids/charger_ids and
+        statuses (object arrays of the distinct values, in order of first appearance), and timestamp
+        (int64, epoch seconds).
+    """
+    charger_codes, chargers, sampled = [], {}, {}
+    status_codes, statuses = [], {}
+    timestamps = []
+    errors = []
+    n_bytes = 0
+    for name, raw in batch:
+        n_bytes += len(raw)
+        try:
+            entry = _json_loads(raw)
+            site_id = entry.get("nobilId")
+            charger_id = entry.get("evseUid")
+            status = entry.get("status")
+            timestamp = entry.get("timestamp")
+
+            if not all([site_id, charger_id, status, timestamp]):
+                continue
+            timestamp = _as_timestamp(timestamp)
+            if sample.time_window is not None and not sample.time_window[0] <= timestamp < sample.time_window[1]:
+                continue
+            key = (site_id, charger_id)
+            if sample.charger_fraction is not None:
+                if key not in sampled:
+                    sampled[key] = charger_hash(site_id, charger_id) < sample.charger_fraction * 2**32
+                if not sampled[key]:
+                    continue
+            charger_codes.append(chargers.setdefault(key, len(chargers)))
+            status_codes.append(statuses.setdefault(status, len(statuses)))
+            timestamps.append(timestamp)
+        except Exception as e:
+            errors.append(f"Failed to parse {name}: {e}")
+
+    columns = {
+        "charger": np.array(charger_codes, dtype=np.int32),
+        "status": np.array(status_codes, dtype=np.uint8),
+        "timestamp": np.array(timestamps, dtype=np.int64),
+        "site_ids": np.array([key[0] for key in chargers], dtype=object),
+        "charger_ids": np.array([key[1] for key in chargers], dtype=object),
+        "statuses": np.array(list(statuses), dtype=object),
+    }
+    return columns, len(batch), n_bytes, errors
+
+def _index_member_batch(batch):
+    """
+    Returns the charger hash and timestamp of each raw JSON status file in a batch
+    (timestamp -1 for files that do not hold a complete status event).
+    """
+    hashes = np.zeros(len(batch), dtype=np.uint32)
+    timestamps = np.full(len(batch), -1, dtype=np.int64)
+    for i, (_, raw) in enumerate(batch):
+        try:
+            entry = _json_loads(raw)
+            site_id, charger_id = entry.get("nobilId"), entry.get("evseUid")
+            if all([site_id, charger_id, entry.get("status"), entry.get("timestamp")]):
+                timestamps[i] = _as_timestamp(entry["timestamp"])
+                hashes[i] = charger_hash(site_id, charger_id)
+        except Exception:
+            pass
+    return hashes, timestamps
 
-                    site_id = entry.get("nobilId")
-                    charger_id = entry.get("evseUid")
-                    status = entry.get("status")
-                    timestamp = entry.get("timestamp")
+def build_member_index(tar_path, workers=INGEST_WORKERS, batch_files=INGEST_BATCH_FILES):
+    """
+    One-time indexing of a status archive for fast sampled reads.
+
+    Decompresses the archive once to an uncompressed sidecar .tar (gzip streams cannot be
+    seeked), and stores the offset, size, charger hash and timestamp of every data/ member in
+    '<archive>.index.npz'. Later reads with a StatusSample pick members from the index and
+    seek straight to them instead of decompressing the archive from the start.
+    The archive's size and modification time are stored with the index; reads ignore an
+    index whose archive has changed since.
+    """
+    raw_path, index_path = _index_paths(tar_path)
+    signature = _archive_signature(tar_path)
+    print(f"[INFO] Decompressing {tar_path} to {raw_path}...")
+    with gzip.open(tar_path, "rb") as src, open(raw_path + ".tmp", "wb") as dst:
+        shutil.copyfileobj(src, dst, 1 << 20)
+    os.replace(raw_path + ".tmp", raw_path)
+
+    # Listing an uncompressed tar only reads the member headers
+    with tarfile.open(raw_path, mode="r:") as tar:
+        members = [(m.name, m.offset_data, m.size) for m in tar if m.isfile() and m.name.startswith("data/")]
+    names = np.array([m[0] for m in members])
+    offsets = np.array([m[1] for m in members], dtype=np.int64)
+    sizes = np.array([m[2] for m in members], dtype=np.int64)
+
+    print(f"[INFO] Indexing {len(members)} members...")
+    batches = _read_members(raw_path, names, offsets, sizes, batch_files)
+    with Pool(workers) if workers > 1 else _NoPool() as pool:
+        parts = list(pool.imap(_index_member_batch, batches))
+    hashes = np.concatenate([p[0] for p in parts]) if parts else np.zeros(0, dtype=np.uint32)
+    timestamps = np.concatenate([p[1] for p in parts]) if parts else np.zeros(0, dtype=np.int64)
+
+    np.savez(index_path + ".tmp.npz", name=names, offset=offsets, size=sizes, timestamp=timestamps, charger_hash=hashes,
+             archive_signature=signature, raw_size=os.path.getsize(raw_path))
+    os.replace(index_path + ".tmp.npz", index_path)
+    print(f"[DONE] Indexed {len(members)} members to {index_path}.")
+
+def read_status_columns(tar_path, sample=StatusSample(), workers=INGEST_WORKERS, batch_files=INGEST_BATCH_FILES):
+    """
+    Reads the status files of a .tar.gz archive into columnar arrays.
+
+    The main process streams the archive and hands batches of raw bytes to a pool of
+    `workers` parsing processes, which decode them (with orjson when available) into
+    column arrays. Throughput is reported in files/s and MB/s of decompressed JSON.
+    `sample` restricts the read (see StatusSample); when the archive has a member index
+    (see build_member_index) built from its current version, only the sampled members are read.
+    A stale index is ignored with a warning.
+
+    Workers dictionary-encode chargers and statuses per batch, and the codes are remapped to
+    archive-wide codes as batches arrive, so no per-event strings are held while reading.
+
+    Returns:
+        dict of numpy arrays: per event (in archive order) charger (int32), status (uint8) and
+        timestamp (int64), where charger codes index site_ids/charger_ids and status codes index
+        statuses, both in order of first appearance.
+    """
+    print(f"[INFO] Opening tar file: {tar_path}")
+    parts = []
+    chargers, statuses = {}, {}
+    n_files, n_bytes = 0, 0
+    started = time.perf_counter()
+
+    raw_path, index_path = _index_paths(tar_path)
+    if _index_is_current(tar_path):
+        print(f"[INFO] Using member index {index_path}")
+        batches = _iter_indexed_batches(tar_path, batch_files, sample)
+    else:
+        if os.path.exists(index_path):
+            print(f"[WARNING] Ignoring member index {index_path}: the archive changed since it was built "
+                  f"or its sidecar {raw_path} is missing (run the index command to rebuild it).")
+        batches = _iter_member_batches(tar_path, batch_files, sample)
+    parse = partial(_parse_member_batch, sample=sample)
+    with Pool(workers) if workers > 1 else _NoPool() as pool:
+        print(f"[INFO] Streaming archive contents...")
+        for batch_columns, batch_files_read, batch_bytes, errors in pool.imap(parse, batches):
+            for error in errors:
+                print(f"[ERROR] {error}")
+            # Remap the batch's codes to archive-wide codes (in order of first appearance)
+            charger_map = np.array([chargers.setdefault(key, len(chargers)) for key in
+                                    zip(batch_columns["site_ids"], batch_columns["charger_ids"])], dtype=np.int32)
+            status_map = np.array([statuses.setdefault(status, len(statuses))
+                                   for status in batch_columns["statuses"]], dtype=np.uint8)
+            parts.append((charger_map[batch_columns["charger"]], status_map[batch_columns["status"]],
+                          batch_columns["timestamp"]))
+            n_files += batch_files_read
+            n_bytes += batch_bytes
+            elapsed = time.perf_counter() - started
+            print(f"[PROGRESS] Processed {n_files} files, {n_files / elapsed:,.0f} files/s, "
+                  f"{n_bytes / 2**20 / elapsed:.1f} MB/s")
+
+    columns = {
+        "charger": np.concatenate([p[0] for p in parts] or [np.zeros(0, dtype=np.int32)]),
+        "status": np.concatenate([p[1] for p in parts] or [np.zeros(0, dtype=np.uint8)]),
+        "timestamp": np.concatenate([p[2] for p in parts] or [np.zeros(0, dtype=np.int64)]),
+        "site_ids": np.array([key[0] for key in chargers], dtype=object),
+        "charger_ids": np.array([key[1] for key in chargers], dtype=object),
+        "statuses": np.array(list(statuses), dtype=object),
+    }
+    elapsed = time.perf_counter() - started
+    print(f"[INFO] Read {len(columns['timestamp'])} status events from {n_files} files in {elapsed:.1f}s "
+          f"({n_files / max(elapsed, 1e-9):,.0f} files/s, {n_bytes / 2**20 / max(elapsed, 1e-9):.1f} MB/s)")
+    return columns
+
+class _NoPool:
+    """
+    Stand-in for multiprocessing.Pool that runs work in the calling process.
+    """
+    def __enter__(self):
+        return self
 
-                    if all([site_id, charger_id, status, timestamp]):
-                        key = (site_id, charger_id)
-                        charger_logs[key].append((timestamp, status))
-                except Exception as e:
-                    print(f"[ERROR] Failed to parse {member.name}: {e}")
+    def __exit__(self, *exc):
+        return False
 
-            if i % 1000 == 0:
-                print(f"[PROGRESS] Processed {i} files...")
+    def imap(self, func, iterable):
+        return map(func, iterable)
 
-    print(f"[INFO] Sorting timestamps for each charger...")
-    for key in charger_logs:
-        charger_logs[key].sort()
+class StatusLog(NamedTuple):
+    """
+    Columnar charger status log, one entry per status event, sorted by (charger, timestamp).
+
+    - charger: int32 code of the charger, indexing site_ids/charger_ids
+    - timestamp: int64 epoch seconds
+    - status: uint8 dictionary code, indexing statuses (sorted, so code order is string order)
+    - site_ids, charger_ids: (nobilId, evseUid) of each charger code
+    - statuses: status strings
+    """
+    charger: np.ndarray
+    timestamp: np.ndarray
+    status: np.ndarray
+    site_ids: np.ndarray
+    charger_ids: np.ndarray
+    statuses: np.ndarray
+
+    @property
+    def nbytes(self):
+        return sum(column.nbytes for column in (self.charger, self.timestamp, self.status))
+
+    def group_starts(self):
+        """
+        Returns the index of the first event of each charger group (events are sorted by charger).
+        """
+        if not len(self.charger):
+            return np.array([], dtype=np.int64)
+        return np.flatnonzero(np.r_[True, self.charger[1:] != self.charger[:-1]])
+
+def build_status_log(columns):
+    """
+    Turns dictionary-encoded status columns (see read_status_columns) into a StatusLog.
+    Chargers keep their codes (order of first appearance), status codes are renumbered in
+    string order, and events are ordered with a single lexsort by (charger, timestamp, status).
+    """
+    status_order = np.argsort(columns["statuses"]).astype(np.uint8)
+    status_rank = np.empty_like(status_order)
+    status_rank[status_order] = np.arange(len(status_order), dtype=np.uint8)
+    status_codes = status_rank[columns["status"]]
+    order = np.lexsort((status_codes, columns["timestamp"], columns["charger"]))
+
+    return StatusLog(
+        charger=columns["charger"][order],
+        timestamp=columns["timestamp"][order],
+        status=status_codes[order],
+        site_ids=columns["site_ids"],
+        charger_ids=columns["charger_ids"],
+        statuses=columns["statuses"][status_order],
+    )
+
+def load_charger_statuses(tar_path, read_first=None, workers=INGEST_WORKERS, sample=None):
+    """
+    Streams and parses a .tar.gz file containing JSON timeseries data into a columnar
+    StatusLog, grouped by (nobilId, evseUid) and sorted by timestamp within each charger.
+
+    `sample` (a StatusSample) reads only part of the archive; `read_first` is a shorthand
+    for StatusSample(max_files=read_first).
+    """
+    if sample is None:
+        sample = StatusSample(max_files=read_first)
+    columns = read_status_columns(tar_path, sample, workers)
 
-    print(f"[DONE] Parsed {len(charger_logs)} unique chargers.")
-    return charger_logs
+    print(f"[INFO] Encoding and sorting status events...")
+    status_log = build_status_log(columns)
+
+    print(f"[DONE] Parsed {len(status_log.site_ids)} unique chargers, {len(status_log.timestamp)} events "
+          f"({status_log.nbytes / 2**20:.1f} MB).")
+    return status_log
 
 # ------------------------
 # Status Inspection
 # ------------------------
 
-def get_all_unique_statuses(charger_logs):
+def get_all_unique_statuses(status_log):
     """
-    Scans all logs and returns a sorted set of all unique status values found.
+    Returns a sorted list of all unique status values found in the log.
     """
-    statuses = set()
-    for entries in charger_logs.values():
-        for _, status in entries:
-            statuses.add(status)
-    return sorted(statuses)
+    return status_log.statuses[np.unique(status_log.status)].tolist()
 
 # ------------------------
 # Charging Session Logic
 # ------------------------
 
-def extract_charging_sessions(charger_logs):
+def extract_charging_sessions(status_log, open_sessions=None, return_open=False):
     """
     Extracts charging sessions based on status transitions.
 
     A session starts on CHARGING and ends on one of:
     AVAILABLE, BLOCKED, OUTOFORDER, UNKNOWN
 
-    Ignores RESERVED transitions.
+    Ignores RESERVED transitions (and any other status).
+
+    Works on whole arrays: after dropping ignored statuses, a session starts at a CHARGING
+    event that opens its charger's events or follows an end status, and ends at an end status
+    that follows a CHARGING event of the same charger. A session still open at the end of a
+    charger's events is not returned.
+
+    `open_sessions` (DataFrame with site_id, charger_id and start) carries sessions still open
+    at the end of an earlier log into this one: each acts as a CHARGING event at its start,
+    ahead of the charger's events. With `return_open`, the sessions left open at the end of this
+    log are returned too, in the same format.
+
+    Returns:
+        DataFrame with columns site_id, charger_id, start, end, duration (seconds), ordered
+        by charger and start time; with `return_open`, a (sessions, open_sessions) tuple.
     """
-    sessions = []
+    statuses = status_log.statuses
+    is_charging_code = statuses == "CHARGING"
+    is_end_code = np.isin(statuses, ["AVAILABLE", "BLOCKED", "OUTOFORDER", "UNKNOWN"])
 
-    session_end_statuses = {"AVAILABLE", "BLOCKED", "OUTOFORDER", "UNKNOWN"}
+    # Keep only the events that drive the state machine
+    relevant = (is_charging_code | is_end_code)[status_log.status]
+    charger = status_log.charger[relevant]
+    timestamp = status_log.timestamp[relevant]
+    is_charging = is_charging_code[status_log.status[relevant]]
+    site_ids, charger_ids = status_log.site_ids, status_log.charger_ids
 
-    for (site_id, charger_id), events in charger_logs.items():
-        charging_start = None
+    if open_sessions is not None and len(open_sessions):
+        # Code the carried-over chargers (new codes for chargers without events in this log)
+        # and put their open session's start first in their group
+        known = pd.MultiIndex.from_arrays([site_ids, charger_ids])
+        carried = pd.MultiIndex.from_arrays([open_sessions["site_id"], open_sessions["charger_id"]])
+        codes = known.get_indexer(carried)
+        unknown = codes < 0
+        codes[unknown] = len(site_ids) + np.arange(unknown.sum())
+        site_ids = np.concatenate([site_ids, np.asarray(open_sessions["site_id"], dtype=object)[unknown]])
+        charger_ids = np.concatenate([charger_ids, np.asarray(open_sessions["charger_id"], dtype=object)[unknown]])
 
-        for ts, status in events:
-            if status == "CHARGING" and charging_start is None:
-                charging_start = ts
-            elif status in session_end_statuses and charging_start is not None:
-                duration = ts - charging_start
-                sessions.append((site_id, charger_id, charging_start, ts, duration))
-                charging_start = None
+        order = np.argsort(np.concatenate([codes, charger]), kind="stable")
+        charger = np.concatenate([codes, charger])[order].astype(np.int32)
+        timestamp = np.concatenate([open_sessions["start"].to_numpy(np.int64), timestamp])[order]
+        is_charging = np.concatenate([np.ones(len(codes), dtype=bool), is_charging])[order]
 
-    return sessions
+    # Group boundaries and shifted comparisons with the previous relevant event
+    new_group = np.r_[True, charger[1:] != charger[:-1]]
+    prev_charging = np.r_[False, is_charging[:-1]]
+    starts = np.flatnonzero(is_charging & (new_group | ~prev_charging))
+    ends = np.flatnonzero(~is_charging & ~new_group & prev_charging)
 
-def load_metadata(metadata_path):
+    # Each end closes the latest session start before it (always within the same charger)
+    matched_starts = starts[np.searchsorted(starts, ends, side="right") - 1]
+
+    codes = charger[ends]
+    start_ts = timestamp[matched_starts]
+    end_ts = timestamp[ends]
+    sessions = pd.DataFrame({
+        "site_id": site_ids[codes],
+        "charger_id": charger_ids[codes],
+        "start": start_ts,
+        "end": end_ts,
+        "duration": end_ts - start_ts,
+    })
+    if not return_open:
+        return sessions
+
+    # Chargers whose last relevant event is CHARGING: their latest session start is still open
+    last = np.flatnonzero(np.r_[charger[1:] != charger[:-1], True]) if len(charger) else np.array([], dtype=np.int64)
+    last = last[is_charging[last]]
+    open_starts = starts[np.searchsorted(starts, last, side="right") - 1]
+    still_open = pd.DataFrame({
+        "site_id": site_ids[charger[last]],
+        "charger_id": charger_ids[charger[last]],
+        "start": timestamp[open_starts],
+    })
+    return sessions, still_open
+
+# Connector attributes whose value is the translated text ('trans') rather than 'attrval'
+TEXT_VALUE_CONN_ATTRS = {1, 4, 5, 17, 19, 20, 25, 26}
+EVSE_ID_ATTR = "28"
+
+SITE_SCHEMA = pa.schema([
+    ("site_id", pa.string()),
+    ("site_name", pa.string()),
+    ("operator", pa.string()),
+    ("owner", pa.string()),
+    ("street", pa.string()),
+    ("zipcode", pa.string()),
+    ("city", pa.string()),
+    ("municipality", pa.string()),
+    ("county", pa.string()),
+    ("latitude", pa.float64()),
+    ("longitude", pa.float64()),
+])
+CHARGER_SCHEMA = pa.schema([
+    ("charger_id", pa.string()),
+    ("site_id", pa.string()),
+    ("connector", pa.string()),
+])
+# Dynamic attributes (one row per attribute and site or charger), keyed by NOBIL attribute type id
+SITE_ATTRIBUTE_SCHEMA = pa.schema([
+    ("site_id", pa.string()),
+    ("attr_id", pa.int16()),
+    ("attrname", pa.string()),
+    ("value", pa.string()),
+])
+CHARGER_ATTRIBUTE_SCHEMA = pa.schema([
+    ("charger_id", pa.string()),
+    ("attr_id", pa.int16()),
+    ("attrname", pa.string()),
+    ("value", pa.string()),
+])
+METADATA_SCHEMAS = {
+    "site": SITE_SCHEMA,
+    "charger": CHARGER_SCHEMA,
+    "site_attribute": SITE_ATTRIBUTE_SCHEMA,
+    "charger_attribute": CHARGER_ATTRIBUTE_SCHEMA,
+}
+
+def iter_chargerstations(metadata_path, block_bytes=METADATA_BLOCK_BYTES):
+    """
+    Yields the stations of the metadata dump's "chargerstations" array one at a time, reading
+    the file in blocks of `block_bytes` characters, so memory does not grow with the dump size.
+    """
+    decoder = json.JSONDecoder()
+    with open(metadata_path, "r", encoding="utf-8-sig") as f:
+        # Skip to the start of the array, keeping a tail in case the key spans two blocks
+        buf = ""
+        while True:
+            block = f.read(block_bytes)
+            if not block:
+                return
+            buf += block
+            match = re.search(r'"chargerstations"\s*:\s*\[', buf)
+            if match:
+                buf = buf[match.end():]
+                break
+            buf = buf[-64:]
+
+        pos = 0
+        while True:
+            while pos < len(buf) and buf[pos] in " \t\r\n,":
+                pos += 1
+            if pos < len(buf) and buf[pos] == "]":
+                return
+            try:
+                station, pos = decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                # The next station is incomplete: append the next block and decode it again
+                block = f.read(block_bytes)
+                if not block:
+                    raise
+                buf, pos = buf[pos:] + block, 0
+                continue
+            yield station
+
+def _parse_position(pos):
     """
-    Parses metadata into two DataFrames:
-    - site_metadata_df: site-level info (e.g., operator, address, location)
-    - charger_metadata_df: charger-level info (e.g., EVSE ID, power, connector type)
+    Returns (latitude, longitude) from a csmd Position, either a dict or a "(lat, lon)" string.
     """
+    if isinstance(pos, dict):
+        return pos.get("Latitude"), pos.get("Longitude")
+    if isinstance(pos, str) and pos.startswith("("):
+        try:
+            lat_str, lon_str = pos.strip("()").split(",")
+            return float(lat_str), float(lon_str)
+        except ValueError:
+            pass  # Leave lat/lon as None
+    return None, None
+
+def _as_text(value):
+    return None if value is None else str(value)
 
-    with open(metadata_path, "r", encoding="utf-8") as f:
-        meta = json.load(f)
+def iter_metadata_batches(metadata_path, batch_stations=METADATA_BATCH_STATIONS):
+    """
+    Streams the metadata dump as fixed-schema Arrow record batches of `batch_stations` stations.
+
+    Yields dicts with one record batch per table:
+    - site: site-level info (e.g., operator, address, location)
+    - charger: one row per connector with an EVSE ID
+    - site_attribute / charger_attribute: the dynamic station and connector attributes as
+      (id, attr_id, attrname, value) rows
+    """
+    columns = {name: {field.name: [] for field in schema} for name, schema in METADATA_SCHEMAS.items()}
 
-    sites = []
-    chargers = []
-    text_value_con_attrs = [1, 4, 5, 17, 19, 20, 25, 26]
+    def flush():
+        batch = {name: pa.RecordBatch.from_pydict(columns[name], schema=schema)
+                 for name, schema in METADATA_SCHEMAS.items()}
+        for table in columns.values():
+            for values in table.values():
+                values.clear()
+        return batch
 
-    for station in meta.get("chargerstations", []):
+    stations = 0
+    for station in iter_chargerstations(metadata_path):
         csmd = station.get("csmd", {})
         attrs = station.get("attr", {})
-        st = attrs.get("st", {})
-        conn_map = attrs.get("conn", {})
 
         # ------------------------
         # Site-level metadata
         # ------------------------
         site_id = csmd.get("International_id")
+        lat, lon = _parse_position(csmd.get("Position"))
+        site = columns["site"]
+        for column, value in (("site_id", site_id), ("site_name", csmd.get("name")), ("operator", csmd.get("Operator")),
+                              ("owner", csmd.get("Owned_by")), ("street", csmd.get("Street")),
+                              ("zipcode", csmd.get("Zipcode")), ("city", csmd.get("City")),
+                              ("municipality", csmd.get("Municipality")), ("county", csmd.get("County"))):
+            site[column].append(_as_text(value))
+        site["latitude"].append(lat)
+        site["longitude"].append(lon)
 
-        # Parse (lat, lon) tuple
-        pos = csmd.get("Position")
-        lat, lon = None, None
-
-        if isinstance(pos, dict):
-            lat = pos.get("Latitude")
-            lon = pos.get("Longitude")
-        elif isinstance(pos, str) and pos.startswith("("):
-            try:
-                lat_str, lon_str = pos.strip("()").split(",")
-                lat, lon = float(lat_str), float(lon_str)
-            except ValueError:
-                pass  # Leave lat/lon as None
-
-        site_dict = {
-            "site_id": site_id,
-            "site_name": csmd.get("name"),
-            "operator": csmd.get("Operator"),
-            "owner": csmd.get("Owned_by"),
-            "street": csmd.get("Street"),
-            "zipcode": csmd.get("Zipcode"),
-            "city": csmd.get("City"),
-            "municipality": csmd.get("Municipality"),
-            "county": csmd.get("County"),
-            "latitude": lat,
-            "longitude": lon,
-        }
-        for _, v in st.items():
-            site_dict[v['attrname']] = v['trans']
-        sites.append(site_dict)
+        site_attrs = columns["site_attribute"]
+        for k, v in attrs.get("st", {}).items():
+            site_attrs["site_id"].append(site_id)
+            site_attrs["attr_id"].append(int(k))
+            site_attrs["attrname"].append(v["attrname"])
+            site_attrs["value"].append(_as_text(v["trans"]))
 
         # ------------------------
         # Charger-level metadata
         # ------------------------
-        for _, conn_attrs in conn_map.items():
-            charger_id = conn_attrs.get("28", {}).get("attrval")  # EVSE ID
+        charger_attrs = columns["charger_attribute"]
+        for connector, conn_attrs in attrs.get("conn", {}).items():
+            charger_id = conn_attrs.get(EVSE_ID_ATTR, {}).get("attrval")
             if not charger_id:
                 continue
-            charger_dict = {
-                "charger_id": charger_id,
-                "site_id": site_id,
-            }
+            columns["charger"]["charger_id"].append(charger_id)
+            columns["charger"]["site_id"].append(site_id)
+            columns["charger"]["connector"].append(connector)
             for k, v in conn_attrs.items():
-                value = v['trans'] if int(k) in text_value_con_attrs else v['attrval']
-                charger_dict[v['attrname']] = value
-            chargers.append(charger_dict)
+                charger_attrs["charger_id"].append(charger_id)
+                charger_attrs["attr_id"].append(int(k))
+                charger_attrs["attrname"].append(v["attrname"])
+                charger_attrs["value"].append(_as_text(v["trans"] if int(k) in TEXT_VALUE_CONN_ATTRS else v["attrval"]))
+
+        stations += 1
+        if stations % batch_stations == 0:
+            yield flush()
+    if stations % batch_stations or stations == 0:
+        yield flush()
 
-    return pd.DataFrame(sites), pd.DataFrame(chargers)
+def load_metadata(metadata_path):
+    """
+    Parses the whole metadata dump into DataFrames (see iter_metadata_batches), keyed by table name.
+    """
+    batches = {name: [] for name in METADATA_SCHEMAS}
+    for batch in iter_metadata_batches(metadata_path):
+        for name, records in batch.items():
+            batches[name].append(records)
+    return {name: pa.Table.from_batches(records, schema=METADATA_SCHEMAS[name]).to_pandas()
+            for name, records in batches.items()}
+
+# ------------------------
+# DuckDB Ingestion
+# ------------------------
+
+SESSION_TABLE_SQL = """
+CREATE TABLE IF NOT EXISTS session (
+    site_id VARCHAR,
+    charger_id VARCHAR,
+    "start" BIGINT,
+    "end" BIGINT,
+    duration BIGINT,
+    start_dt TIMESTAMP,
+    hour TIMESTAMP,
+    day DATE,
+    archive VARCHAR
+)
+"""
+
+MANIFEST_TABLE_SQL = """
+CREATE TABLE IF NOT EXISTS ingested_archive (
+    archive VARCHAR PRIMARY KEY,
+    sessions BIGINT,
+    loaded_at TIMESTAMP,
+    last_event BIGINT
+)
+"""
+
+# Sessions still CHARGING at the end of the last ingested archive, carried into the next one
+OPEN_SESSION_TABLE_SQL = """
+CREATE TABLE IF NOT EXISTS open_session (
+    site_id VARCHAR,
+    charger_id VARCHAR,
+    "start" BIGINT,
+    archive VARCHAR
+)
+"""
+
+def _arrow_reader(df):
+    """
+    Wraps a DataFrame as a stream of Arrow record batches for DuckDB to scan.
+    Numeric columns are handed over without copying.
+    """
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    return pa.RecordBatchReader.from_batches(table.schema, table.to_batches(max_chunksize=ARROW_BATCH_ROWS))
+
+def ingest_sessions(con, tar_paths, read_first=None, workers=INGEST_WORKERS):
+    """
+    Extracts sessions from each archive not yet listed in the ingested_archive manifest
+    and appends them to the session table, one transaction per archive.
+
+    Archives are taken in name (date) order. Sessions still open at the end of an archive are
+    kept in the open_session table and seed the extraction of the next archive, so a session
+    spanning archives is stored once, with the archive it ended in. An archive whose last
+    event is older than the last event already ingested is rejected, since the open sessions
+    would come from its future.
+
+    Raises ValueError when the session table holds sessions but the manifest is empty (a table
+    filled before the manifest existed), as its archives would be ingested a second time.
+
+    Rows are inserted ordered by (site_id, start), so DuckDB's per row-group min/max
+    statistics let the dashboard's site_id and time-range filters skip most of the table;
+    an index on site_id serves the per-site lookups.
+    """
+    con.execute(SESSION_TABLE_SQL)
+    # Tables created before sessions recorded their archive
+    con.execute("ALTER TABLE session ADD COLUMN IF NOT EXISTS archive VARCHAR")
+    con.execute(MANIFEST_TABLE_SQL)
+    # Manifests created before archives recorded their last event
+    con.execute("ALTER TABLE ingested_archive ADD COLUMN IF NOT EXISTS last_event BIGINT")
+    con.execute(OPEN_SESSION_TABLE_SQL)
+    con.execute("CREATE INDEX IF NOT EXISTS session_site_idx ON session (site_id)")
+    loaded = {row[0] for row in con.execute("SELECT archive FROM ingested_archive").fetchall()}
+    if not loaded:
+        existing = con.execute("SELECT COUNT(*) FROM session").fetchone()[0]
+        if existing:
+            raise ValueError(f"The session table holds {existing} sessions but no archive is listed in "
+                             f"ingested_archive; drop the session table and ingest all archives again.")
+
+    for tar_path in sorted(tar_paths, key=os.path.basename):
+        archive = os.path.basename(tar_path)
+        if archive in loaded:
+            print(f"[INFO] Skipping {archive}, already loaded.")
+            continue
+
+        status_log = load_charger_statuses(tar_path, read_first, workers)
+        last_event = int(status_log.timestamp.max()) if len(status_log.timestamp) else None
+        last_ingested = con.execute("SELECT MAX(last_event) FROM ingested_archive").fetchone()[0]
+        if last_event is not None and last_ingested is not None and last_event < last_ingested:
+            print(f"[ERROR] Rejected {archive}: its last event ({last_event}) is older than the last event "
+                  f"already ingested ({last_ingested}).")
+            continue
+        open_sessions = con.execute('SELECT site_id, charger_id, "start" FROM open_session').fetchdf()
+        sessions_df, still_open = extract_charging_sessions(status_log, open_sessions, return_open=True)
+        sessions_batch = _arrow_reader(sessions_df)
+
+        con.begin()
+        con.register("sessions_batch", sessions_batch)
+        con.execute("""
+            INSERT INTO session BY NAME
+            SELECT site_id, charger_id, "start", "end", duration,
+                   make_timestamp("start" * 1000000) AS start_dt,
+                   date_trunc('hour', make_timestamp("start" * 1000000)) AS hour,
+                   CAST(make_timestamp("start" * 1000000) AS DATE) AS day,
+                   ? AS archive
+            FROM sessions_batch
+            ORDER BY site_id, "start"
+        """, [archive])
+        con.unregister("sessions_batch")
+        con.register("open_batch", _arrow_reader(still_open))
+        con.execute("DELETE FROM open_session")
+        con.execute("INSERT INTO open_session BY NAME SELECT *, ? AS archive FROM open_batch", [archive])
+        con.unregister("open_batch")
+        con.execute("INSERT INTO ingested_archive (archive, sessions, loaded_at, last_event) VALUES (?, ?, now(), ?)",
+                    [archive, len(sessions_df), last_event])
+        con.commit()
+        print(f"[DONE] Loaded {len(sessions_df)} sessions from {archive} into session table, "
+              f"{len(still_open)} still open.")
+
+def upsert_table(con, table, df, key):
+    """
+    Inserts new rows of `df` into `table` and replaces rows whose values changed, matching on
+    `key`. The table is created on first use and gains any new columns of `df` as they appear.
+    """
+    df = df.drop_duplicates(subset=[key], keep="last")
+    con.register("upsert_batch", _arrow_reader(df))
+    con.execute(f"CREATE TABLE IF NOT EXISTS {table} AS SELECT * FROM upsert_batch LIMIT 0")
+    existing = {row[0] for row in con.execute(f"DESCRIBE {table}").fetchall()}
+    for name, dtype in con.execute("SELECT column_name, column_type FROM (DESCRIBE upsert_batch)").fetchall():
+        if name not in existing:
+            con.execute(f'ALTER TABLE {table} ADD COLUMN "{name}" {dtype}')
+
+    columns = ", ".join(f'"{c}"' for c in df.columns)
+    con.begin()
+    con.execute(f"CREATE OR REPLACE TEMP TABLE upsert_changed AS "
+                f"SELECT {columns} FROM upsert_batch EXCEPT SELECT {columns} FROM {table}")
+    con.execute(f'DELETE FROM {table} WHERE "{key}" IN (SELECT "{key}" FROM upsert_changed)')
+    con.execute(f"INSERT INTO {table} BY NAME SELECT * FROM upsert_changed")
+    changed = con.execute("SELECT COUNT(*) FROM upsert_changed").fetchone()[0]
+    con.execute("DROP TABLE upsert_changed")
+    con.commit()
+    con.unregister("upsert_batch")
+    print(f"[DONE] Upserted {changed} changed rows into {table}.")
+
+METADATA_TABLES_SQL = [
+    """
+    CREATE TABLE IF NOT EXISTS site (
+        site_id VARCHAR, site_name VARCHAR, operator VARCHAR, owner VARCHAR, street VARCHAR,
+        zipcode VARCHAR, city VARCHAR, municipality VARCHAR, county VARCHAR,
+        latitude DOUBLE, longitude DOUBLE
+    )
+    """,
+    "CREATE TABLE IF NOT EXISTS charger (charger_id VARCHAR, site_id VARCHAR, connector VARCHAR)",
+    "CREATE TABLE IF NOT EXISTS site_attribute (site_id VARCHAR, attr_id SMALLINT, attrname VARCHAR, value VARCHAR)",
+    "CREATE TABLE IF NOT EXISTS charger_attribute (charger_id VARCHAR, attr_id SMALLINT, attrname VARCHAR, value VARCHAR)",
+]
+
+def replace_attributes(con, table, batch, key):
+    """
+    Replaces the rows of `table` belonging to the sites or chargers (`key`) in the Arrow record
+    `batch` whose attributes changed, so attributes dropped from the dump are dropped too.
+    """
+    con.register("attribute_batch", pa.Table.from_batches([batch]))
+    con.begin()
+    con.execute(f"""
+        CREATE OR REPLACE TEMP TABLE attribute_changed AS
+        SELECT "{key}" FROM (SELECT * FROM attribute_batch EXCEPT SELECT * FROM {table})
+        UNION
+        SELECT "{key}" FROM (SELECT * FROM {table} WHERE "{key}" IN (SELECT "{key}" FROM attribute_batch)
+                             EXCEPT SELECT * FROM attribute_batch)
+    """)
+    con.execute(f'DELETE FROM {table} WHERE "{key}" IN (SELECT "{key}" FROM attribute_changed)')
+    con.execute(f"""
+        INSERT INTO {table} BY NAME
+        SELECT DISTINCT * FROM attribute_batch WHERE "{key}" IN (SELECT "{key}" FROM attribute_changed)
+    """)
+    con.execute("DROP TABLE attribute_changed")
+    con.commit()
+    con.unregister("attribute_batch")
+
+def ingest_metadata(con, metadata_path):
+    """
+    Streams the site and charger metadata dump into DuckDB one batch of stations at a time:
+    upserts the site and charger tables and replaces the stations' rows in the site_attribute
+    and charger_attribute tables.
+    """
+    for sql in METADATA_TABLES_SQL:
+        con.execute(sql)
+    stations = 0
+    for batch in iter_metadata_batches(metadata_path):
+        upsert_table(con, "site", batch["site"].to_pandas(), "site_id")
+        upsert_table(con, "charger", batch["charger"].to_pandas(), "charger_id")
+        replace_attributes(con, "site_attribute", batch["site_attribute"], "site_id")
+        replace_attributes(con, "charger_attribute", batch["charger_attribute"], "charger_id")
+        stations += batch["site"].num_rows
+    con.execute("CREATE INDEX IF NOT EXISTS charger_site_idx ON charger (site_id)")
+    con.execute("CREATE INDEX IF NOT EXISTS site_attribute_site_idx ON site_attribute (site_id)")
+    con.execute("CREATE INDEX IF NOT EXISTS charger_attribute_charger_idx ON charger_attribute (charger_id)")
+    print(f"[DONE] Ingested metadata of {stations} stations.")
+
+# ------------------------
+# Occupancy
+# ------------------------
+
+OCCUPANCY_BUCKETS = {"minute": 60, "hour": 3600}
+
+def build_occupancy(con, min_duration=120, bucket=None):
+    """
+    Builds the occupancy table: the number of active sessions per site over time.
+
+    Sweep line over the session table: each session (longer than `min_duration` seconds, as
+    filtered by the dashboard) becomes a +1 event at its start and a -1 event at its end, and a
+    cumulative sum per site ordered by time gives the active sessions from each event time
+    until the next one (a session counts as active on [start, end)).
+
+    With `bucket` ("minute" or "hour") event times are floored to the bucket: active_sessions
+    is the level at the end of the bucket and peak_sessions the highest level within it.
+    """
+    width = OCCUPANCY_BUCKETS[bucket] if bucket else 1
+    con.execute(f"""
+        CREATE OR REPLACE TABLE occupancy AS
+        WITH events AS (
+            SELECT site_id, "start" AS ts, 1 AS delta FROM session WHERE duration > {int(min_duration)}
+            UNION ALL
+            SELECT site_id, "end" AS ts, -1 AS delta FROM session WHERE duration > {int(min_duration)}
+        ),
+        changes AS (
+            SELECT site_id, ts, SUM(delta) AS delta FROM events GROUP BY site_id, ts
+        ),
+        levels AS (
+            SELECT site_id, ts,
+                   SUM(delta) OVER (PARTITION BY site_id ORDER BY ts ROWS UNBOUNDED PRECEDING) AS active_sessions
+            FROM changes
+        )
+        SELECT site_id,
+               make_timestamp((ts // {width} * {width}) * 1000000) AS ts,
+               arg_max(active_sessions, ts)::INTEGER AS active_sessions,
+               MAX(active_sessions)::INTEGER AS peak_sessions
+        FROM levels
+        GROUP BY site_id, ts // {width}
+        ORDER BY site_id, ts
+    """)
+    rows = con.execute("SELECT COUNT(*) FROM occupancy").fetchone()[0]
+    print(f"[DONE] Built occupancy table with {rows} rows.")
+
+# ------------------------
+# Hourly site aggregates
+# ------------------------
+
+SITE_HOURLY_TABLE_SQL = """
+CREATE TABLE IF NOT EXISTS site_hourly (
+    site_id VARCHAR,
+    hour TIMESTAMP,
+    busy_minutes DOUBLE,
+    sessions INTEGER,
+    chargers INTEGER,
+    utilization DOUBLE
+)
+"""
+
+SITE_HOURLY_MANIFEST_SQL = """
+CREATE TABLE IF NOT EXISTS site_hourly_archive (
+    archive VARCHAR PRIMARY KEY,
+    aggregated_at TIMESTAMP
+)
+"""
+
+# Per-site charger count: the chargers that ever had a session
+SITE_CHARGERS_SQL = "SELECT site_id, COUNT(DISTINCT charger_id)::INTEGER AS chargers FROM session GROUP BY site_id"
+
+def build_site_hourly(con, min_duration=120, full=False):
+    """
+    Maintains the site_hourly table: per site and hour, the charger minutes in use by sessions
+    longer than `min_duration` seconds (busy_minutes), the sessions started (sessions) and
+    busy_minutes as a fraction of the site's charger capacity (utilization). Hours without
+    sessions have no row.
+
+    The first run (or `full`) aggregates the whole session table: each session is expanded to
+    the hours it overlaps with generate_series. Later runs only aggregate the archives ingested
+    since, recomputing the hours their sessions touch with a range join against all sessions.
+    """
+    con.execute(SITE_HOURLY_TABLE_SQL)
+    con.execute(SITE_HOURLY_MANIFEST_SQL)
+    pending = [row[0] for row in con.execute(
+        "SELECT archive FROM ingested_archive WHERE archive NOT IN (SELECT archive FROM site_hourly_archive)").fetchall()]
+    full = full or con.execute("SELECT COUNT(*) FROM site_hourly").fetchone()[0] == 0
+    if not full and not pending:
+        print("[INFO] site_hourly is up to date.")
+        return
+
+    con.begin()
+    if full:
+        con.execute(f"""
+            CREATE OR REPLACE TABLE site_hourly AS
+            WITH hours AS (
+                SELECT site_id, "start", "end",
+                       UNNEST(generate_series("start" // 3600 * 3600, ("end" - 1) // 3600 * 3600, 3600)) AS h
+                FROM session
+                WHERE duration > {int(min_duration)}
+            )
+            SELECT site_id, make_timestamp(h * 1000000) AS hour,
+                   SUM(LEAST("end", h + 3600) - GREATEST("start", h)) / 60.0 AS busy_minutes,
+                   COUNT(*) FILTER (WHERE "start" >= h)::INTEGER AS sessions,
+                   chargers,
+                   SUM(LEAST("end", h + 3600) - GREATEST("start", h)) / 60.0 / (60 * chargers) AS utilization
+            FROM hours JOIN ({SITE_CHARGERS_SQL}) USING (site_id)
+            GROUP BY site_id, h, chargers
+            ORDER BY site_id, hour
+        """)
+        con.execute("DELETE FROM site_hourly_archive")
+        pending = [row[0] for row in con.execute("SELECT archive FROM ingested_archive").fetchall()]
+    else:
+        # Hours touched by the new sessions, recomputed from every session overlapping them
+        con.execute(f"""
+            CREATE OR REPLACE TEMP TABLE hourly_affected AS
+            SELECT DISTINCT site_id,
+                   UNNEST(generate_series("start" // 3600 * 3600, ("end" - 1) // 3600 * 3600, 3600)) AS h
+            FROM session
+            WHERE duration > {int(min_duration)} AND archive IN (SELECT UNNEST(?))
+        """, [pending])
+        con.execute(f"""
+            CREATE OR REPLACE TEMP TABLE hourly_update AS
+            SELECT a.site_id, make_timestamp(a.h * 1000000) AS hour,
+                   SUM(LEAST(s."end", a.h + 3600) - GREATEST(s."start", a.h)) / 60.0 AS busy_minutes,
+                   COUNT(*) FILTER (WHERE s."start" >= a.h)::INTEGER AS sessions
+            FROM hourly_affected a
+            JOIN session s ON s.site_id = a.site_id AND s."start" < a.h + 3600 AND s."end" > a.h
+            WHERE s.duration > {int(min_duration)}
+            GROUP BY a.site_id, a.h
+        """)
+        con.execute("""
+            DELETE FROM site_hourly
+            WHERE (site_id, hour) IN (SELECT site_id, hour FROM hourly_update)
+        """)
+        con.execute(f"""
+            INSERT INTO site_hourly BY NAME
+            SELECT u.*, c.chargers, u.busy_minutes / (60 * c.chargers) AS utilization
+            FROM hourly_update u JOIN ({SITE_CHARGERS_SQL}) c USING (site_id)
+        """)
+        # New chargers change the capacity of the site's earlier hours too
+        con.execute(f"""
+            UPDATE site_hourly h
+            SET chargers = c.chargers, utilization = h.busy_minutes / (60 * c.chargers)
+            FROM ({SITE_CHARGERS_SQL}) c
+            WHERE h.site_id = c.site_id AND h.chargers <> c.chargers
+        """)
+        con.execute("DROP TABLE hourly_affected")
+        con.execute("DROP TABLE hourly_update")
+    con.executemany("INSERT INTO site_hourly_archive VALUES (?, now())", [[archive] for archive in pending])
+    con.commit()
+    rows = con.execute("SELECT COUNT(*) FROM site_hourly").fetchone()[0]
+    print(f"[DONE] {'Built' if full else 'Updated'} site_hourly from {len(pending)} archives, {rows} rows.")
 
 # ------------------------
 # Main Execution
 # ------------------------
 
 if __name__ == "__main__":
-    sessions_in_duckdb = True
-    if not sessions_in_duckdb:
-
-        # ----------------------------
-        # Load and parse session data
-        # ----------------------------
-        charger_logs = load_charger_statuses(TAR_PATH)
+    parser = argparse.ArgumentParser(description="NOBIL charger status pipeline.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    ingest_parser = subparsers.add_parser("ingest", help="Load new archives and metadata into DuckDB")
+    ingest_parser.add_argument("archives", nargs="*", help=f"Status archives (default: {TAR_GLOB})")
+    ingest_parser.add_argument("--metadata", default=METADATA_PATH, help="NOBIL metadata dump")
+    ingest_parser.add_argument("--skip-metadata", action="store_true")
+    ingest_parser.add_argument("--workers", type=int, default=INGEST_WORKERS)
+    ingest_parser.add_argument("--occupancy-bucket", choices=sorted(OCCUPANCY_BUCKETS))
+    hourly_parser = subparsers.add_parser("hourly", help="Update the site_hourly table")
+    hourly_parser.add_argument("--full", action="store_true", help="Rebuild it from all sessions")
+    occupancy_parser = subparsers.add_parser("occupancy", help="Rebuild the occupancy table")
+    occupancy_parser.add_argument("--bucket", choices=sorted(OCCUPANCY_BUCKETS))
+    statuses_parser = subparsers.add_parser("statuses", help="List the unique status values of an archive")
+    statuses_parser.add_argument("archive", nargs="?", default=TAR_PATH)
+    statuses_parser.add_argument("--max-files", type=int, help="Read at most this many status files")
+    statuses_parser.add_argument("--max-mb", type=float, help="Read at most this many MB of raw JSON")
+    statuses_parser.add_argument("--charger-fraction", type=float, help="Sample this fraction of chargers")
+    subparsers.add_parser("index", help="Build member indexes for fast sampled reads. Each archive is also "
+                          "decompressed to a sidecar .tar, a full uncompressed copy (about 50x the .gz size "
+                          "on the sample data)").add_argument(
+        "archives", nargs="*", help=f"Status archives (default: {TAR_GLOB})")
+    subparsers.add_parser("ui", help="Start the DuckDB UI")
+    args = parser.parse_args()
 
+    if args.command == "statuses":
         # Inspect all unique statuses
-        unique_statuses = get_all_unique_statuses(charger_logs)
+        sample = StatusSample(max_files=args.max_files,
+                              max_bytes=int(args.max_mb * 2**20) if args.max_mb else None,
+                              charger_fraction=args.charger_fraction)
+        unique_statuses = get_all_unique_statuses(load_charger_statuses(args.archive, sample=sample))
         print("\n[INFO] Unique status values in data:")
         for s in unique_statuses:
             print(f" - {s}")
 
-        # Extract sessions from logs
-        sessions = extract_charging_sessions(charger_logs)
+    elif args.command == "ingest":
+        con = duckdb.connect(DB_PATH)
+        ingest_sessions(con, args.archives or sorted(glob.glob(TAR_GLOB)), workers=args.workers)
+        if not args.skip_metadata:
+            ingest_metadata(con, args.metadata)
+        build_occupancy(con, bucket=args.occupancy_bucket)
+        build_site_hourly(con)
 
+    elif args.command == "index":
+        for tar_path in args.archives or sorted(glob.glob(TAR_GLOB)):
+            build_member_index(tar_path)
+
+    elif args.command == "hourly":
+        build_site_hourly(duckdb.connect(DB_PATH), full=args.full)
+
+    elif args.command == "occupancy":
+        build_occupancy(duckdb.connect(DB_PATH), bucket=args.bucket)
+
+    else:
         # ----------------------------
-        # Build DataFrame from sessions
-        # ----------------------------
-        sessions_df = pd.DataFrame(sessions, columns=["site_id", "charger_id", "start", "end", "duration"])
-        sessions_df["start_dt"] = pd.to_datetime(sessions_df["start"], unit="s")
-        sessions_df["hour"] = sessions_df["start_dt"].dt.floor("h")
-        sessions_df["day"] = sessions_df["start_dt"].dt.date
-        con.execute("DROP TABLE IF EXISTS session")
-        con.execute("CREATE TABLE session AS SELECT * FROM sessions_df")
-
-    metadata_in_duckdb = True
-    if not metadata_in_duckdb:
-        # ----------------------------
-        # Load and inspect metadata
+        # DuckDB UI
         # ----------------------------
-        site_metadata_df, charger_metadata_df = load_metadata(METADATA_PATH)
-        con.execute("DROP TABLE IF EXISTS charger")
-        con.execute("CREATE TABLE charger AS SELECT * FROM charger_metadata_df")
-        con.execute("DROP TABLE IF EXISTS site")
-        con.execute("CREATE TABLE site AS SELECT * FROM site_metadata_df")
-
-
-    # ----------------------------
-    # DuckDB UI
-    # ----------------------------
-    con.execute("CALL start_ui_server()")
-    print("Duckdb UI started on http://localhost:4213")
-    input("Press enter to stop")
+        con = duckdb.connect(DB_PATH)
+        con.execute("CALL start_ui_server()")
+        print("Duckdb UI started on http://localhost:4213")
+        input("Press enter to stop")
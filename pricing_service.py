@@ -0,0 +1,298 @@
+import argparse
+import json
+import threading
+import time
+import traceback
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import NamedTuple
+from urllib.parse import parse_qs, urlparse
+import numpy as np
+import pandas as pd
+
+SERVICE_HOST = "127.0.0.1"
+SERVICE_PORT = 8765
+REFRESH_MINUTES = 60  # Background retraining interval
+SITE_DATA_ID = "site_data"  # Site id of the single site in data/site_data.csv
+
+# ------------------------
+# Registry
+# ------------------------
+
+class SitePrices(NamedTuple):
+    """
+    Day-ahead curve of one site: hourly values starting at first_hour (datetime64[h]).
+    """
+    first_hour: np.datetime64
+    price_index: np.ndarray
+    yhat: np.ndarray
+    method: str
+
+class PriceSnapshot(NamedTuple):
+    sites: dict  # site_id -> SitePrices
+    models: dict  # site_id -> fitted forecaster (see forecasters), when the source keeps them
+    trained_at: float  # Epoch seconds, 0 before the first training
+    cutoff: str
+
+class PriceRegistry:
+    """
+    In-memory registry of the latest price curves and fitted models. Retraining builds a new
+    snapshot and swaps it in with one assignment, so lookups never wait for a fit or a lock.
+    """
+    def __init__(self):
+        self.snapshot = PriceSnapshot({}, {}, 0.0, None)
+
+    def publish(self, prices, models=None):
+        """
+        Replaces the registry contents with `prices` ('site_id', 'ds', 'yhat', 'price_index', 'method').
+        """
+        prices = prices.sort_values(['site_id', 'ds'])
+        sites = {}
+        for site_id, curve in prices.groupby('site_id', sort=False):
+            hours = curve['ds'].to_numpy().astype('datetime64[h]')
+            # Lookups index by hour offset, so the curve must be one value per consecutive hour
+            full = np.arange(hours[0], hours[-1] + 1)
+            position = (hours - hours[0]).astype(np.int64)
+            price_index = np.full(len(full), np.nan)
+            yhat = np.full(len(full), np.nan)
+            price_index[position] = curve['price_index'].to_numpy()
+            yhat[position] = curve['yhat'].to_numpy()
+            sites[str(site_id)] = SitePrices(hours[0], price_index, yhat, curve['method'].iloc[0])
+        cutoff = str(prices['ds'].min()) if len(prices) else None
+        self.snapshot = PriceSnapshot(sites, models or {}, time.time(), cutoff)
+
+    def lookup(self, site_id, hour):
+        """
+        Returns {'site_id', 'hour', 'price_index', 'yhat'} for `hour` (anything np.datetime64
+        parses, floored to the hour), or an 'error' entry when it is not in the registry.
+        """
+        curve = self.snapshot.sites.get(site_id)
+        if curve is None:
+            return {'site_id': site_id, 'hour': hour, 'error': 'unknown site'}
+        try:
+            offset = int((np.datetime64(hour, 'h') - curve.first_hour).astype(np.int64))
+        except ValueError:
+            return {'site_id': site_id, 'hour': hour, 'error': 'invalid hour'}
+        if not 0 <= offset < len(curve.price_index) or np.isnan(curve.price_index[offset]):
+            return {'site_id': site_id, 'hour': hour, 'error': 'hour not forecast'}
+        return {'site_id': site_id, 'hour': str(curve.first_hour + offset),
+                'price_index': float(curve.price_index[offset]), 'yhat': float(curve.yhat[offset])}
+
+    def lookup_batch(self, requests):
+        """
+        Looks up many (site_id, hour) pairs at once, parsing all hours in one NumPy call.
+        Returns one lookup result per pair, in order.
+        """
+        snapshot = self.snapshot
+        try:
+            hours = np.array([hour for _, hour in requests], dtype='datetime64[h]').astype(np.int64)
+        except ValueError:
+            return [self.lookup(site_id, hour) for site_id, hour in requests]
+        results = []
+        for (site_id, hour), h in zip(requests, hours.tolist()):
+            curve = snapshot.sites.get(site_id)
+            offset = h - int(curve.first_hour.astype(np.int64)) if curve is not None else -1
+            if curve is None or not 0 <= offset < len(curve.price_index) or np.isnan(curve.price_index[offset]):
+                results.append(self.lookup(site_id, hour))
+                continue
+            results.append({'site_id': site_id, 'hour': str(curve.first_hour + offset),
+                            'price_index': float(curve.price_index[offset]), 'yhat': float(curve.yhat[offset])})
+        return results
+
+    def curve(self, site_id):
+        """
+        Returns the whole price curve of a site as {'site_id', 'hours', 'price_index', 'yhat'}.
+        """
+        curve = self.snapshot.sites.get(site_id)
+        if curve is None:
+            return {'site_id': site_id, 'error': 'unknown site'}
+        hours = curve.first_hour + np.arange(len(curve.price_index))
+        return {'site_id': site_id, 'hours': hours.astype(str).tolist(),
+                'price_index': curve.price_index.tolist(), 'yhat': curve.yhat.tolist(), 'method': curve.method}
+
+    def status(self):
+        snapshot = self.snapshot
+        methods = {}
+        for curve in snapshot.sites.values():
+            methods[curve.method] = methods.get(curve.method, 0) + 1
+        return {'ready': snapshot.trained_at > 0, 'sites': len(snapshot.sites), 'methods': methods,
+                'cutoff': snapshot.cutoff, 'trained_at': snapshot.trained_at,
+                'age_seconds': time.time() - snapshot.trained_at if snapshot.trained_at else None}
+
+# ------------------------
+# Training
+# ------------------------
+
+def train_site_data(engine='prophet', scalemin=None, scalemax=None):
+    """
+    Forecasts all 24 hours of the day after the last day of data/site_data.csv and prices them.
+    Returns (prices, models) for PriceRegistry.publish.
+    """
+    import forecasters
+    import integration_mock_up
+    scalemin = integration_mock_up.PRICE_INDEX_MIN if scalemin is None else scalemin
+    scalemax = integration_mock_up.PRICE_INDEX_MAX if scalemax is None else scalemax
+
+    train_df = integration_mock_up.load_full_data().rename(columns={'Start time': 'ds', 'Energy_Wh': 'y'})
+    future = pd.DataFrame({'ds': pd.date_range(train_df['ds'].max().normalize() + pd.Timedelta(days=1), periods=24, freq='h')})
+    if engine == 'auto':
+        forecaster, _ = forecasters.select_forecaster(train_df, prophet_params=forecasters.PROPHET_PARAMS)
+    else:
+        forecaster = forecasters.make_forecaster(engine, forecasters.PROPHET_PARAMS)
+    fcst = forecaster.fit(train_df).predict(future)[['ds', 'yhat']]
+    fcst['site_id'] = SITE_DATA_ID
+    fcst['method'] = forecaster.name
+    return _price_forecasts(fcst, scalemin, scalemax), {SITE_DATA_ID: forecaster}
+
+def train_nobil(db_path, engine='prophet', metric='utilization', workers=None, scalemin=None, scalemax=None):
+    """
+    Forecasts the day after the latest hour of every site in the NOBIL site_hourly table
+    (see batch_forecast.forecast_sites) and prices it. Returns (prices, models).
+    """
+    import duckdb
+    import batch_forecast
+    import integration_mock_up
+    scalemin = integration_mock_up.PRICE_INDEX_MIN if scalemin is None else scalemin
+    scalemax = integration_mock_up.PRICE_INDEX_MAX if scalemax is None else scalemax
+
+    con = duckdb.connect(db_path, read_only=True)
+    try:
+        fcst = batch_forecast.forecast_sites(con, engine=engine, metric=metric,
+                                             workers=workers or batch_forecast.BATCH_WORKERS)
+    finally:
+        con.close()
+    return _price_forecasts(fcst, scalemin, scalemax), {}
+
+def _price_forecasts(fcst, scalemin, scalemax):
+    """
+    Adds the hourly price index of each site's forecast day (see compute_hourly_price_index).
+    """
+    import integration_mock_up
+    if fcst.empty:
+        return fcst.assign(price_index=np.nan)[['site_id', 'ds', 'yhat', 'price_index', 'method']]
+    fcst = fcst.assign(date=pd.to_datetime(fcst['ds']).dt.date).reset_index(drop=True)
+    price_index = integration_mock_up.compute_hourly_price_index(fcst, scalemin, scalemax, by=['site_id', 'date'])
+    fcst['price_index'] = price_index['price_index'].to_numpy()
+    return fcst[['site_id', 'ds', 'yhat', 'price_index', 'method']]
+
+def start_retraining(registry, train, every_seconds=REFRESH_MINUTES * 60):
+    """
+    Runs `train` (returning (prices, models)) now and then every `every_seconds` on a daemon
+    thread, publishing each result to `registry`. A failed run keeps the previous prices.
+    Returns the threading.Event that stops the scheduler.
+    """
+    stop = threading.Event()
+
+    def run():
+        while not stop.is_set():
+            started = time.perf_counter()
+            try:
+                prices, models = train()
+                registry.publish(prices, models)
+                print(f"[DONE] Retrained {len(registry.snapshot.sites)} sites in {time.perf_counter() - started:.1f}s.")
+            except Exception:
+                print("[ERROR] Retraining failed, keeping the previous prices:")
+                traceback.print_exc()
+            stop.wait(every_seconds)
+
+    threading.Thread(target=run, name="retraining", daemon=True).start()
+    return stop
+
+# ------------------------
+# HTTP interface
+# ------------------------
+
+def make_handler(registry):
+    """
+    Request handler answering from `registry`:
+    - GET /price?site=X&hour=2024-06-18T13 -> one hour
+    - GET /curve?site=X                    -> the whole forecast curve
+    - POST /prices {"requests": [{"site": X, "hour": H}, ...]} -> a batch of hours
+    - GET /sites                           -> the site ids with prices
+    - GET /status                          -> registry size and age
+    """
+    class PriceHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # Keep-alive, so clients reuse connections
+        disable_nagle_algorithm = True  # Headers and body are separate writes; don't delay the body
+
+        def _send(self, status, payload):
+            body = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            params = {k: v[0] for k, v in parse_qs(url.query).items()}
+            if url.path == "/status":
+                return self._send(200, registry.status())
+            if url.path == "/sites":
+                return self._send(200, {'sites': list(registry.snapshot.sites)})
+            if not registry.snapshot.trained_at:
+                return self._send(503, {'error': 'models not trained yet'})
+            if url.path == "/price" and "site" in params and "hour" in params:
+                result = registry.lookup(params["site"], params["hour"])
+                return self._send(404 if 'error' in result else 200, result)
+            if url.path == "/curve" and "site" in params:
+                result = registry.curve(params["site"])
+                return self._send(404 if 'error' in result else 200, result)
+            self._send(400, {'error': 'expected /price?site=&hour=, /curve?site=, /sites or /status'})
+
+        def do_POST(self):
+            if urlparse(self.path).path != "/prices":
+                return self._send(404, {'error': 'expected POST /prices'})
+            if not registry.snapshot.trained_at:
+                return self._send(503, {'error': 'models not trained yet'})
+            try:
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+                results = registry.lookup_batch([(r["site"], r["hour"]) for r in body["requests"]])
+            except (ValueError, KeyError, TypeError) as e:
+                return self._send(400, {'error': f'invalid batch request: {e}'})
+            self._send(200, {'results': results})
+
+        def log_message(self, format, *args):
+            pass  # Per-request logging would dominate the latency
+
+    return PriceHandler
+
+class PriceServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128  # Pending connections; the default of 5 resets bursts of clients
+
+def serve(registry, host=SERVICE_HOST, port=SERVICE_PORT):
+    """
+    Returns a started HTTP server for `registry`, serving from a background thread.
+    """
+    server = PriceServer((host, port), make_handler(registry))
+    threading.Thread(target=server.serve_forever, name="http", daemon=True).start()
+    return server
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve day-ahead price index curves from an in-memory model registry.")
+    parser.add_argument("--source", choices=["site-data", "nobil"], default="site-data",
+                        help="Train on data/site_data.csv or on every site of the NOBIL DuckDB database")
+    parser.add_argument("--db", help="NOBIL DuckDB database (default: batch_forecast.DB_PATH)")
+    parser.add_argument("--engine", default="prophet", help="Forecaster name (see forecasters.FORECASTERS) or 'auto'")
+    parser.add_argument("--metric", default="utilization", help="site_hourly column forecast for NOBIL sites")
+    parser.add_argument("--workers", type=int, help="Forecast worker processes for NOBIL sites")
+    parser.add_argument("--refresh-minutes", type=float, default=REFRESH_MINUTES)
+    parser.add_argument("--host", default=SERVICE_HOST)
+    parser.add_argument("--port", type=int, default=SERVICE_PORT)
+    args = parser.parse_args()
+
+    if args.source == "nobil":
+        import batch_forecast
+        db_path = args.db or batch_forecast.DB_PATH
+        train = lambda: train_nobil(db_path, args.engine, args.metric, args.workers)
+    else:
+        train = lambda: train_site_data(args.engine)
+
+    registry = PriceRegistry()
+    server = serve(registry, args.host, args.port)
+    start_retraining(registry, train, args.refresh_minutes * 60)
+    print(f"Pricing service on http://{args.host}:{args.port} (retraining every {args.refresh_minutes:g} min)")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -1,27 +1,170 @@
+import argparse
+import hashlib
+import io
+import json
+import os
+import tracemalloc
+import numpy as np
 import pandas as pd
 
-def get_data(file_path="data/site_data.csv"):
+NS_PER_HOUR = 3600 * 10**9
+CACHE_DIR = os.path.join("data", "cache")
+INCREMENTAL_DIR = os.path.join(CACHE_DIR, "incremental")
+
+# Columns and formats of the session export used by the streaming reader
+SESSION_DTYPES = {"Start time": "str", "Count.Stop time": "str", "Modified Count.Energy (Wh)": "str"}
+DATE_FORMAT = "%Y-%m-%d %H:%M"
+# Conservative estimate of memory per CSV row while parsing and splitting a chunk
+# (raw text, tokenizer buffers, parsed columns and hourly fragments)
+BYTES_PER_ROW_ESTIMATE = 512
+
+def linear_profile(progress):
     """
-    Reads the CSV file, filters out charging sessions with duration less than 5 minutes
-    or greater than 60 minutes, and accurately distributes energy demand on an hourly basis.
-    For each session (lasting at most 1 hour):
-      - If the session is fully within one hour, all energy is assigned to that hour.
-      - If the session spans two hours, energy is split proportionally between the two hours.
-      
+    Cumulative energy share for a session charging at constant power: energy is spread
+    evenly over the session time.
+    """
+    return progress
+
+linear_profile.key = "linear"
+
+def tapered_profile(taper_start=0.8, end_power=0.2):
+    """
+    Returns a cumulative energy profile for a session that charges at full power until
+    `taper_start` (share of the session time) and then tapers linearly down to `end_power`
+    (share of full power) at the end of the session, as is typical for DC fast charging.
+    `taper_start` must be in [0, 1); use linear_profile for sessions without a taper.
+    """
+    if not 0 <= taper_start < 1:
+        raise ValueError(f"taper_start must be in [0, 1), got {taper_start!r}")
+
+    def cumulative_power(u):
+        tail = np.clip(u - taper_start, 0, None)
+        return u - (1 - end_power) * tail ** 2 / (2 * (1 - taper_start))
+
+    total = cumulative_power(1.0)
+
+    def profile(progress):
+        return cumulative_power(progress) / total
+
+    profile.key = f"tapered(taper_start={taper_start!r}, end_power={end_power!r})"
+    return profile
+
+def split_sessions_by_hour(start, stop, energy, profile=linear_profile):
+    """
+    Apportions the energy of charging sessions of any length over the hours they cover,
+    using array operations only.
+      - Each session is expanded into one fragment per hour between its start and stop hour.
+      - Each fragment gets the share of energy delivered during its part of the session, as
+        given by `profile`.
+
+    `profile` maps session progress (0 at start, 1 at stop, as a NumPy array) to the cumulative
+    share of the session energy delivered by then. The default `linear_profile` splits energy
+    proportionally to time; see `tapered_profile` for a DC style charging curve.
+
+    Fragments are emitted in session order (earliest hour first), so summing them per hour
+    gives exactly the same result as walking the sessions one by one.
+
+    Every session needs a start and stop time, with stop not before start; a ValueError is
+    raised otherwise (aggregate_sessions drops such rows first).
+
+    Returns:
+        A DataFrame with one row per hourly fragment and the columns 'Start time' and 'Energy_Wh'.
+    """
+    start_ns = pd.to_datetime(pd.Series(start)).to_numpy(dtype="datetime64[ns]").view("int64")
+    stop_ns = pd.to_datetime(pd.Series(stop)).to_numpy(dtype="datetime64[ns]").view("int64")
+    missing = (start_ns == np.iinfo(np.int64).min) | (stop_ns == np.iinfo(np.int64).min)
+    if missing.any():
+        raise ValueError(f"{missing.sum()} sessions have no start or stop time")
+    if (stop_ns < start_ns).any():
+        raise ValueError(f"{(stop_ns < start_ns).sum()} sessions stop before they start")
+    energy = np.asarray(energy, dtype=float)
+
+    start_hour = start_ns // NS_PER_HOUR
+    stop_hour = stop_ns // NS_PER_HOUR
+    duration = (stop_ns - start_ns) / 1e9
+
+    # Expand every session into one fragment per hour it covers (repeat plus cumulative offsets)
+    counts = stop_hour - start_hour + 1
+    session_idx = np.repeat(np.arange(len(counts)), counts)
+    offset = np.arange(len(session_idx)) - np.repeat(np.cumsum(counts) - counts, counts)
+    hour = start_hour[session_idx] + offset
+
+    # Part of the session inside each fragment's hour, as progress through the session
+    session_start = start_ns[session_idx]
+    session_duration = duration[session_idx]
+    lower = np.maximum(session_start, hour * NS_PER_HOUR)
+    upper = np.minimum(stop_ns[session_idx], (hour + 1) * NS_PER_HOUR)
+    zero_length = session_duration == 0
+    safe_duration = np.where(zero_length, 1.0, session_duration)
+    progress_lower = np.where(zero_length, 0.0, (lower - session_start) / 1e9 / safe_duration)
+    progress_upper = np.where(zero_length, 1.0, (upper - session_start) / 1e9 / safe_duration)
+
+    fraction = profile(progress_upper) - profile(progress_lower)
+    fragment_energy = np.where(counts[session_idx] > 1, energy[session_idx] * fraction, energy[session_idx])
+
+    hours = (hour * NS_PER_HOUR).astype("datetime64[ns]")
+    return pd.DataFrame({"Start time": hours, "Energy_Wh": fragment_energy})
+
+def file_content_hash(file_path, block_size=1 << 20):
+    """
+    Returns the SHA-256 hex digest of a file's content, read in blocks.
+    """
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def _profile_key(profile):
+    """
+    Identifies an energy profile by its `key` attribute, which names the profile and its
+    parameters (see linear_profile and tapered_profile). Returns None for profiles without a
+    key, whose results are never cached.
+    """
+    return getattr(profile, "key", None)
+
+def cache_entry_path(file_path, content_hash, params, cache_dir):
+    """
+    Builds the cache file path for a source file: '<source name>-<content hash>-<params hash>.parquet'.
+    """
+    params_hash = hashlib.sha256(json.dumps(params, sort_keys=True).encode()).hexdigest()[:16]
+    source_name = os.path.splitext(os.path.basename(file_path))[0]
+    return os.path.join(cache_dir, f"{source_name}-{content_hash[:16]}-{params_hash}.parquet")
+
+def evict_stale_entries(file_path, content_hash, cache_dir):
+    """
+    Removes cache entries built from an older version of the source file.
+    """
+    source_name = os.path.splitext(os.path.basename(file_path))[0]
+    for name in os.listdir(cache_dir):
+        parts = os.path.splitext(name)[0].rsplit("-", 2)
+        if len(parts) == 3 and parts[0] == source_name and parts[1] != content_hash[:16]:
+            os.remove(os.path.join(cache_dir, name))
+
+def aggregate_sessions(df, min_duration=5, max_duration=60, profile=linear_profile):
+    """
+    Filters parsed charging sessions on duration and aggregates their energy per hour.
+    Sessions without a start or stop time, or stopping before they start, are always dropped.
+    `df` holds the raw CSV columns with 'Start time' and 'Count.Stop time' parsed as datetimes.
+
     Returns:
         A DataFrame with 'Start time' (floored to the hour) as the index and 'Energy_Wh' as the only column.
     """
-    # Read CSV and parse dates for both start and stop times
-    df = pd.read_csv(file_path, parse_dates=["Start time", "Count.Stop time"])
-    
     # Calculate session duration in minutes
     df["Duration"] = (df["Count.Stop time"] - df["Start time"]).dt.total_seconds() / 60
+
+    # Drop sessions without start or stop time, or stopping before they start (the duration
+    # filters below only drop them when they are set)
+    df = df[df["Duration"] >= 0]
     
-    # Filter out sessions with duration less than 5 minutes or greater than 60 minutes
-    df = df[(df["Duration"] >= 5) & (df["Duration"] <= 60)]
+    # Filter out sessions with duration outside [min_duration, max_duration]
+    if min_duration is not None:
+        df = df[df["Duration"] >= min_duration]
+    if max_duration is not None:
+        df = df[df["Duration"] <= max_duration]
     
     # Rename the energy column for consistency
-    df.rename(columns={"Modified Count.Energy (Wh)": "Energy_Wh"}, inplace=True)
+    df = df.rename(columns={"Modified Count.Energy (Wh)": "Energy_Wh"})
     
     # Convert Energy_Wh to numeric and drop rows with NaN values in Energy_Wh
     df["Energy_Wh"] = pd.to_numeric(df["Energy_Wh"], errors="coerce")
@@ -30,42 +173,215 @@ def get_data(file_path="data/site_data.csv"):
     #Adjust obfuscated energy data by dividing by 10, convert to kwh by dividing by 1000
     df["Energy_Wh"] = df["Energy_Wh"] / 10 / 1000
     
-    # List to store hourly contributions
-    hourly_data = []
+    # Split every session into its hourly contributions
+    hourly_df = split_sessions_by_hour(df["Start time"], df["Count.Stop time"], df["Energy_Wh"], profile)
+
+    # Aggregate energy per hour
+    hourly_df = hourly_df.groupby("Start time", as_index=True).sum()
     
-    # Process each session
-    for _, row in df.iterrows():
-        start = row["Start time"]
-        stop = row["Count.Stop time"]
-        energy = row["Energy_Wh"]
-        
-        # If the session is completely within one hour, assign all energy to that hour.
-        if start.floor("H") == stop.floor("H"):
-            hour = start.floor("H")
-            hourly_data.append({"Start time": hour, "Energy_Wh": energy})
-        else:
-            # The session spans two hours.
-            # Compute the end of the first hour
-            first_hour_end = start.floor("H") + pd.Timedelta(hours=1)
-            # Calculate the fraction of the session in the first hour
-            first_fraction = (first_hour_end - start).total_seconds() / (stop - start).total_seconds()
-            second_fraction = 1 - first_fraction
-            
-            # Energy allocated to the first hour
-            energy_first = energy * first_fraction
-            # Energy allocated to the second hour
-            energy_second = energy * second_fraction
-            
-            hourly_data.append({"Start time": start.floor("H"), "Energy_Wh": energy_first})
-            hourly_data.append({"Start time": stop.floor("H"), "Energy_Wh": energy_second})
+    return hourly_df
+
+def get_data(file_path="data/site_data.csv", min_duration=5, max_duration=60, profile=linear_profile,
+             use_cache=True, refresh=False, cache_dir=CACHE_DIR):
+    """
+    Reads the CSV file, optionally filters out charging sessions with duration less than
+    `min_duration` minutes or greater than `max_duration` minutes, and accurately distributes
+    energy demand on an hourly basis. Pass None to disable either filter.
+    For each session:
+      - If the session is fully within one hour, all energy is assigned to that hour.
+      - If the session spans several hours, energy is split between them according to
+        `profile` (proportionally to time by default).
+
+    The hourly result is cached as Parquet in `cache_dir`, keyed by the content hash of the
+    source file and the filter parameters, so unchanged inputs load without re-parsing the CSV.
+    Entries for older versions of the source file are evicted when a new entry is written.
+    Set `use_cache=False` to bypass the cache, or `refresh=True` to rebuild the entry. Profiles
+    without a `key` attribute (see _profile_key) always bypass the cache.
+      
+    Returns:
+        A DataFrame with 'Start time' (floored to the hour) as the index and 'Energy_Wh' as the only column.
+    """
+    use_cache = use_cache and _profile_key(profile) is not None
+    if use_cache:
+        content_hash = file_content_hash(file_path)
+        params = {"min_duration": min_duration, "max_duration": max_duration, "profile": _profile_key(profile)}
+        cache_path = cache_entry_path(file_path, content_hash, params, cache_dir)
+        if not refresh and os.path.exists(cache_path):
+            return pd.read_parquet(cache_path)
+
+    # Read CSV and parse dates for both start and stop times
+    df = pd.read_csv(file_path, parse_dates=["Start time", "Count.Stop time"])
     
-    # Convert list to DataFrame and aggregate energy per hour
-    hourly_df = pd.DataFrame(hourly_data)
-    hourly_df = hourly_df.groupby("Start time", as_index=True).sum()
+    hourly_df = aggregate_sessions(df, min_duration, max_duration, profile)
+
+    if use_cache:
+        os.makedirs(cache_dir, exist_ok=True)
+        evict_stale_entries(file_path, content_hash, cache_dir)
+        hourly_df.to_parquet(cache_path)
     
     return hourly_df
 
+def read_sessions_chunked(file_path, max_memory_mb=64, date_format=DATE_FORMAT):
+    """
+    Streams a session export in chunks sized to stay within roughly `max_memory_mb` of memory.
+    Only the columns used by the aggregation are read, with explicit dtypes, and dates are
+    parsed with the fixed `date_format` instead of per-value format inference.
+
+    Yields:
+        DataFrames with 'Start time' and 'Count.Stop time' as datetimes and the energy column as
+        strings (it may hold non-numeric values, which aggregate_sessions coerces to NaN).
+        Dates not matching `date_format` become NaT, which drops their rows; the number of such
+        rows in each chunk is stored in its attrs["unparsed_rows"].
+    """
+    chunk_rows = max(1, int(max_memory_mb * 2**20 // BYTES_PER_ROW_ESTIMATE))
+    reader = pd.read_csv(file_path, usecols=list(SESSION_DTYPES), dtype=SESSION_DTYPES,
+                         chunksize=chunk_rows)
+    for chunk in reader:
+        unparsed = np.zeros(len(chunk), dtype=bool)
+        for column in ["Start time", "Count.Stop time"]:
+            parsed = pd.to_datetime(chunk[column], format=date_format, errors="coerce")
+            # Values present in the file but not in date_format
+            unparsed |= (parsed.isna() & chunk[column].notna()).to_numpy()
+            chunk[column] = parsed
+        chunk.attrs["unparsed_rows"] = int(unparsed.sum())
+        yield chunk
+
+def get_data_chunked(file_path="data/site_data.csv", min_duration=5, max_duration=60, profile=linear_profile,
+                     max_memory_mb=64, date_format=DATE_FORMAT):
+    """
+    Bounded-memory variant of get_data for exports too large to load at once.
+    Each chunk from read_sessions_chunked is aggregated per hour on its own and the partial
+    hourly sums are added together, so only one chunk and the hourly series are held in memory.
+    When done, the peak memory allocated while reading and aggregating (measured with
+    tracemalloc) and the number of rows dropped for dates in another format are printed.
+
+    Returns:
+        A DataFrame with 'Start time' (floored to the hour) as the index and 'Energy_Wh' as the only column.
+    """
+    hourly_df = pd.DataFrame({"Energy_Wh": []}, index=pd.DatetimeIndex([], name="Start time"))
+    rows, chunks, unparsed_rows = 0, 0, 0
+
+    already_tracing = tracemalloc.is_tracing()
+    if already_tracing:
+        tracemalloc.reset_peak()
+    else:
+        tracemalloc.start()
+    baseline_bytes = tracemalloc.get_traced_memory()[0]
+    try:
+        for chunk in read_sessions_chunked(file_path, max_memory_mb, date_format):
+            rows += len(chunk)
+            chunks += 1
+            unparsed_rows += chunk.attrs["unparsed_rows"]
+            partial = aggregate_sessions(chunk, min_duration, max_duration, profile)
+            hourly_df = hourly_df.add(partial, fill_value=0)
+        peak_bytes = tracemalloc.get_traced_memory()[1] - baseline_bytes
+    finally:
+        if not already_tracing:
+            tracemalloc.stop()
+
+    print(f"Read {rows} sessions in {chunks} chunks, peak memory {peak_bytes / 2**20:.1f} MB "
+          f"(budget {max_memory_mb} MB)")
+    if unparsed_rows:
+        print(f"Dropped {unparsed_rows} sessions with dates not in the format {date_format!r}")
+    return hourly_df
+
+def _save_state(state_path, state):
+    """
+    Atomically writes the state file of update_data.
+    """
+    with open(state_path + ".tmp", "w", encoding="utf-8") as state_file:
+        json.dump(state, state_file)
+    os.replace(state_path + ".tmp", state_path)
+
+def update_data(file_path="data/site_data.csv", min_duration=5, max_duration=60, profile=linear_profile,
+                store_dir=INCREMENTAL_DIR):
+    """
+    Incrementally maintains the hourly series for an append-only session CSV.
+
+    A small state file next to the stored series keeps a watermark: the byte offset up to which
+    the CSV has been processed. The export is not ordered by 'Start time' (it concatenates
+    per-charger blocks), so the offset rather than a start time marks the processed rows. Each
+    call parses only the complete rows appended after that offset, aggregates them per hour
+    and adds them to the stored series. A last row without a trailing newline counts as
+    complete on a full rebuild or when the file has not grown since the previous call (the
+    state also keeps the file size); otherwise it may still be being written and is left for
+    the next call.
+    Hours that already hold energy (such as the boundary hour a previous run partly filled, or
+    hours reached by sessions spilling over) are summed with the new contributions.
+
+    The series is rebuilt from scratch when there is no state yet, the parameters changed, the
+    profile has no key (see _profile_key), or the file no longer matches the state (header
+    changed or file shrank).
+
+    Returns:
+        A DataFrame with 'Start time' (floored to the hour) as the index and 'Energy_Wh' as the only column.
+    """
+    source_name = os.path.splitext(os.path.basename(file_path))[0]
+    series_path = os.path.join(store_dir, f"{source_name}.parquet")
+    state_path = os.path.join(store_dir, f"{source_name}.json")
+    params = {"min_duration": min_duration, "max_duration": max_duration, "profile": _profile_key(profile)}
+
+    with open(file_path, "rb") as f:
+        header = f.readline()
+        state = None
+        if os.path.exists(state_path) and os.path.exists(series_path):
+            with open(state_path, "r", encoding="utf-8") as state_file:
+                state = json.load(state_file)
+        file_size = os.fstat(f.fileno()).st_size
+        if (state is None or params["profile"] is None or state["params"] != params
+                or state["header"] != header.decode("utf-8") or state["offset"] > file_size):
+            # No usable state: process the whole file
+            state = {"params": params, "header": header.decode("utf-8"), "offset": len(header), "size": None}
+            stored = None
+        else:
+            stored = pd.read_parquet(series_path)
+        f.seek(state["offset"])
+        new_bytes = f.read()
+    # Only consume complete rows: a last row without newline is read again on the next call,
+    # unless this is a full rebuild or the file stopped growing
+    if stored is not None and file_size != state.get("size"):
+        new_bytes = new_bytes[:new_bytes.rfind(b"\n") + 1]
+    state["size"] = file_size
+
+    # Parse only the rows appended since the last run
+    if new_bytes.strip():
+        columns = pd.read_csv(io.BytesIO(header), nrows=0).columns
+        df = pd.read_csv(io.BytesIO(new_bytes), header=None, names=columns,
+                         parse_dates=["Start time", "Count.Stop time"])
+        new_hourly = aggregate_sessions(df, min_duration, max_duration, profile)
+    elif stored is not None:
+        # Nothing new to add, but the file size decides whether a trailing row is complete
+        _save_state(state_path, state)
+        return stored
+    else:
+        new_hourly = pd.DataFrame({"Energy_Wh": []}, index=pd.DatetimeIndex([], name="Start time"))
+
+    # Merge the new hourly contributions into the stored series
+    hourly_df = new_hourly if stored is None else stored.add(new_hourly, fill_value=0)
+
+    state["offset"] += len(new_bytes)
+    os.makedirs(store_dir, exist_ok=True)
+    hourly_df.to_parquet(series_path + ".tmp")
+    os.replace(series_path + ".tmp", series_path)
+    _save_state(state_path, state)
+
+    return hourly_df
+
 if __name__ == "__main__":
-    data = get_data()
-    print(data.head())
+    parser = argparse.ArgumentParser(description="Aggregate charging sessions into hourly energy.")
+    parser.add_argument("file_path", nargs="?", default="data/site_data.csv")
+    parser.add_argument("--no-cache", action="store_true", help="Do not read or write the hourly cache")
+    parser.add_argument("--refresh", action="store_true", help="Rebuild the cached hourly series")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Only process rows appended since the last incremental run")
+    parser.add_argument("--max-memory-mb", type=float,
+                        help="Stream the file in chunks within this memory budget (no caching)")
+    args = parser.parse_args()
 
+    if args.incremental:
+        data = update_data(args.file_path)
+    elif args.max_memory_mb:
+        data = get_data_chunked(args.file_path, max_memory_mb=args.max_memory_mb)
+    else:
+        data = get_data(args.file_path, use_cache=not args.no_cache, refresh=args.refresh)
+    print(data.head())
@@ -0,0 +1,132 @@
+import argparse
+import time
+import numpy as np
+import pandas as pd
+import integration_mock_up
+from integration_mock_up import BASE_PRICE, PRICE_ELASTICITY
+
+# Grid search over the pricing parameters (scalemin, scalemax, price_elasticity) on stored forecasts.
+#
+# With p = scalemin + position * (scalemax - scalemin) the hourly price index, the dynamic revenue
+# of an hour with actual energy A is BASE_PRICE * A * p * (1 - elasticity * (p - 1)), the formula of
+# integration_mock_up.evaluate_scenarios. Summed over a day it only depends on the parameters
+# through three moments of the day, sum(A), sum(A * position) and sum(A * position^2), so the whole
+# grid is evaluated from a days x 3 moment matrix in one broadcast (combinations x days).
+
+SCALEMIN_VALUES = np.round(np.arange(0.5, 1.001, 0.02), 3)
+SCALEMAX_VALUES = np.round(np.arange(1.0, 2.101, 0.02), 3)
+ELASTICITY_VALUES = np.round(np.linspace(0.0, 0.3, 7), 3)
+DOWNSIDE_QUANTILE = 0.05  # Risk measure: this quantile of the daily revenue change against fixed price
+
+def forecast_matrices(forecasts, full_data):
+    """
+    Reshapes day-ahead forecasts (see integration_mock_up.forecast_days) into days x 24 matrices.
+
+    Returns:
+        (days, position, actual): the forecast days, the position of each hour in its day's price
+        window (see price_positions) and the actual energy of each hour (0 where the hour was not
+        forecast or has no data).
+    """
+    position, _ = integration_mock_up.price_positions(forecasts)
+    actual = full_data.rename(columns={'Start time': 'ds', 'Energy_Wh': 'actual_energy'})
+    actual_energy = forecasts[['ds']].merge(actual[['ds', 'actual_energy']], on='ds', how='left')['actual_energy']
+
+    days, day = np.unique(forecasts['date'].to_numpy(), return_inverse=True)
+    hour = pd.DatetimeIndex(forecasts['ds']).hour.to_numpy()
+    position_matrix = np.full((len(days), 24), 0.5)
+    actual_matrix = np.zeros((len(days), 24))
+    position_matrix[day, hour] = position
+    actual_matrix[day, hour] = actual_energy.fillna(0).to_numpy()
+    return days, position_matrix, actual_matrix
+
+def scenario_grid(scalemin_values=SCALEMIN_VALUES, scalemax_values=SCALEMAX_VALUES, elasticity_values=ELASTICITY_VALUES):
+    """
+    Every (scalemin, scalemax, elasticity) combination with scalemin <= scalemax, as three arrays.
+    """
+    smin, smax, e = (a.ravel() for a in np.meshgrid(scalemin_values, scalemax_values, elasticity_values, indexing='ij'))
+    keep = smin <= smax
+    return smin[keep], smax[keep], e[keep]
+
+def daily_revenue(position, actual, scalemin, scalemax, elasticity):
+    """
+    Dynamic-price revenue of every day (rows of the days x 24 matrices) under every parameter
+    combination (equal-length arrays). Returns a combinations x days matrix.
+    """
+    s0 = actual.sum(axis=1)
+    s1 = (actual * position).sum(axis=1)
+    s2 = (actual * position ** 2).sum(axis=1)
+    smin, span, e = (np.asarray(v, dtype=float)[:, None] for v in (scalemin, np.subtract(scalemax, scalemin), elasticity))
+    # sum(A * p) and sum(A * p^2) from the moments
+    ap = smin * s0 + span * s1
+    ap2 = smin ** 2 * s0 + 2 * smin * span * s1 + span ** 2 * s2
+    return BASE_PRICE * ((1 + e) * ap - e * ap2)
+
+def evaluate_grid(position, actual, scalemin, scalemax, elasticity, downside_quantile=DOWNSIDE_QUANTILE):
+    """
+    Scores every parameter combination against the fixed BASE_PRICE on the same hours.
+
+    Returns:
+        A DataFrame with one row per combination: 'scalemin', 'scalemax', 'elasticity',
+        'revenue' (total), 'revenue_gain' (relative to fixed price), 'downside' (the
+        `downside_quantile` quantile of the daily relative change) and 'worst_day'.
+    """
+    revenue = daily_revenue(position, actual, scalemin, scalemax, elasticity)
+    fixed = BASE_PRICE * actual.sum(axis=1)
+    traded = fixed > 0
+    daily_change = revenue[:, traded] / fixed[traded] - 1
+    return pd.DataFrame({
+        'scalemin': scalemin,
+        'scalemax': scalemax,
+        'elasticity': elasticity,
+        'revenue': revenue.sum(axis=1),
+        'revenue_gain': revenue.sum(axis=1) / fixed.sum() - 1,
+        'downside': np.quantile(daily_change, downside_quantile, axis=1),
+        'worst_day': daily_change.min(axis=1),
+    })
+
+def revenue_frontier(results, max_downside_loss=None, max_worst_day_loss=None):
+    """
+    The revenue-maximizing frontier per elasticity: the combinations for which no other
+    combination has both more revenue and a smaller downside. Combinations whose downside
+    (or worst day) loses more than `max_downside_loss` (or `max_worst_day_loss`), as a fraction
+    of fixed-price revenue, are excluded first.
+    """
+    allowed = results
+    if max_downside_loss is not None:
+        allowed = allowed[allowed['downside'] >= -max_downside_loss]
+    if max_worst_day_loss is not None:
+        allowed = allowed[allowed['worst_day'] >= -max_worst_day_loss]
+
+    # Scanning from the safest combination, keep each one that earns more than all safer ones
+    ordered = allowed.sort_values(['elasticity', 'downside', 'revenue'], ascending=[True, False, False])
+    best_so_far = ordered.groupby('elasticity')['revenue'].cummax()
+    previous_best = best_so_far.groupby(ordered['elasticity']).shift(fill_value=-np.inf)
+    return ordered[ordered['revenue'] > previous_best].reset_index(drop=True)
+
+def optimize_scenarios(forecasts, full_data, scalemin_values=SCALEMIN_VALUES, scalemax_values=SCALEMAX_VALUES,
+                       elasticity_values=ELASTICITY_VALUES, max_downside_loss=None, max_worst_day_loss=None):
+    """
+    Evaluates the whole parameter grid on the stored forecasts and returns (results, frontier),
+    see evaluate_grid and revenue_frontier.
+    """
+    _, position, actual = forecast_matrices(forecasts, full_data)
+    results = evaluate_grid(position, actual, *scenario_grid(scalemin_values, scalemax_values, elasticity_values))
+    return results, revenue_frontier(results, max_downside_loss, max_worst_day_loss)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Find revenue-maximizing price index ranges on the backtest forecasts.")
+    parser.add_argument('--max-downside-loss', type=float, default=0.05,
+                        help=f"Largest allowed loss on the {DOWNSIDE_QUANTILE:.0%} quantile day, as a fraction")
+    parser.add_argument('--max-worst-day-loss', type=float, help="Largest allowed loss on the worst day")
+    parser.add_argument('--elasticity', type=float, default=PRICE_ELASTICITY, help="Elasticity to show the frontier for")
+    args = parser.parse_args()
+
+    full_data = integration_mock_up.load_full_data()
+    forecasts = integration_mock_up.forecast_days(full_data, integration_mock_up.FORECAST_START_DATE,
+                                                  integration_mock_up.SIMULATION_END_DATE)
+    started = time.perf_counter()
+    results, frontier = optimize_scenarios(forecasts, full_data, max_downside_loss=args.max_downside_loss,
+                                           max_worst_day_loss=args.max_worst_day_loss)
+    print(f"\nEvaluated {len(results)} combinations in {(time.perf_counter() - started) * 1000:.1f} ms")
+    print(f"\nFrontier for elasticity {args.elasticity}:")
+    print(frontier[np.isclose(frontier['elasticity'], args.elasticity)].to_string(index=False))
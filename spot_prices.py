@@ -0,0 +1,76 @@
+import os
+import pandas as pd
+import process_data
+
+SPOT_PRICES_PATH = os.path.join("data", "spot_prices_raw.xlsx")
+DEFAULT_ZONE = "SE3"  # Bidding zone used when joining prices onto the site data
+TIMEZONE = "Europe/Stockholm"  # Delivery times in the export are local wall-clock times
+
+def parse_spot_prices(file_path=SPOT_PRICES_PATH):
+    """
+    Parses the Nord Pool day-ahead price export (one column per bidding zone, prices in SEK/MWh)
+    into a long, typed table sorted by zone and hour.
+
+    Returns:
+        A DataFrame with the columns 'Start time' (local wall-clock hour, as in the site data),
+        'Start time UTC', 'zone' (categorical) and 'Price_SEK_MWh'.
+    """
+    # The second header row only holds the unit ('Price (SEK)')
+    raw = pd.read_excel(file_path, sheet_name="data", skiprows=[1])
+    start = pd.to_datetime(raw["Delivery Start (CET)"], format="%d.%m.%Y %H:%M:%S")
+    zones = [c for c in raw.columns if not c.startswith("Delivery")]
+
+    wide = raw[zones].astype("float64")
+    wide.insert(0, "Start time", start)
+    prices = wide.melt(id_vars="Start time", var_name="zone", value_name="Price_SEK_MWh")
+    prices["zone"] = prices["zone"].astype(pd.CategoricalDtype(zones))
+
+    # The repeated hour at the end of daylight saving time is resolved by row order
+    utc = start.dt.tz_localize(TIMEZONE, ambiguous="infer").dt.tz_convert("UTC").dt.tz_localize(None)
+    prices.insert(1, "Start time UTC", pd.concat([utc] * len(zones), ignore_index=True))
+    return prices.sort_values(["zone", "Start time UTC"], ignore_index=True)
+
+def load_spot_prices(file_path=SPOT_PRICES_PATH, use_cache=True, refresh=False, cache_dir=process_data.CACHE_DIR):
+    """
+    Returns the spot prices from parse_spot_prices, cached as Parquet next to the hourly energy
+    cache so the slow xlsx parse only happens when the workbook changes.
+    """
+    if not use_cache:
+        return parse_spot_prices(file_path)
+
+    content_hash = process_data.file_content_hash(file_path)
+    cache_path = process_data.cache_entry_path(file_path, content_hash, {"table": "spot_prices"}, cache_dir)
+    if not refresh and os.path.exists(cache_path):
+        return pd.read_parquet(cache_path)
+
+    prices = parse_spot_prices(file_path)
+    os.makedirs(cache_dir, exist_ok=True)
+    process_data.evict_stale_entries(file_path, content_hash, cache_dir)
+    prices.to_parquet(cache_path)
+    return prices
+
+def join_spot_prices(hourly_df, zone=DEFAULT_ZONE, prices=None):
+    """
+    As-of joins the spot price of `zone` onto an hourly series indexed by 'Start time' (such as
+    the output of process_data.get_data), adding 'Spot_price_SEK_kWh'. Each hour gets the latest
+    price at most one hour old, so the local hour skipped when daylight saving time starts takes
+    the previous hour's price; hours outside the price data are left as NaN.
+    """
+    if prices is None:
+        prices = load_spot_prices()
+    # The repeated local hour at the end of daylight saving time gets the mean of both prices
+    zone_prices = (prices.loc[prices["zone"] == zone].groupby("Start time")["Price_SEK_MWh"].mean() / 1000)
+    zone_prices = zone_prices.rename("Spot_price_SEK_kWh").reset_index()
+
+    index_name = hourly_df.index.name
+    joined = pd.merge_asof(hourly_df.reset_index().sort_values(index_name), zone_prices,
+                           left_on=index_name, right_on="Start time", direction="backward",
+                           tolerance=pd.Timedelta(hours=1))
+    if index_name != "Start time":
+        joined = joined.drop(columns="Start time")
+    return joined.set_index(index_name)
+
+if __name__ == "__main__":
+    prices = load_spot_prices()
+    print(prices.head())
+    print(join_spot_prices(process_data.get_data()).head())
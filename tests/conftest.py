@@ -0,0 +1,8 @@
+import os
+import sys
+
+# The modules under test are top-level scripts in the repository root and in nobil-playground
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+NOBIL_DIR = os.path.join(REPO_ROOT, "nobil-playground")
+sys.path.insert(0, REPO_ROOT)
+sys.path.insert(0, NOBIL_DIR)
@@ -0,0 +1,35 @@
+from datetime import date
+import numpy as np
+import pandas as pd
+import pytest
+import calendar_features
+import prophet_forecasting
+
+@pytest.mark.parametrize("unit", ["s", "ms", "us", "ns"])
+def test_features_do_not_depend_on_timestamp_resolution(unit):
+    ds = pd.DatetimeIndex(["2024-06-18 13:00", "2024-12-31 23:30", "2025-01-01 00:00"]).as_unit(unit)
+    features = calendar_features.calendar_features(ds)
+    assert features["hour"].tolist() == [13, 23, 0]
+    assert features["year"].tolist() == [2024, 2024, 2025]
+    assert features["dayofyear"].tolist() == [170, 366, 1]
+
+def test_duckdb_timestamps():
+    duckdb = pytest.importorskip("duckdb")
+    df = duckdb.sql("SELECT TIMESTAMP '2024-06-18 13:00' AS ds").df()
+    features = calendar_features.calendar_features(df["ds"])
+    assert (features["hour"].tolist(), features["month"].tolist(), features["year"].tolist()) == ([13], [6], [2024])
+
+def test_create_features_matches_datetime_accessors():
+    index = pd.date_range("2023-01-01", "2025-12-31 23:00", freq="h", name="Start time")
+    features = prophet_forecasting.create_features(pd.DataFrame(index=index))
+    assert (features["hour"].to_numpy() == index.hour).all()
+    assert (features["dayofweek"].to_numpy() == index.dayofweek).all()
+    assert (features["weekofyear"].to_numpy() == index.isocalendar().week.to_numpy()).all()
+    assert (features["weekday"].astype(str).to_numpy() == index.day_name()).all()
+    # March 20 has no season (right-closed bins of the original create_features)
+    assert features.loc["2024-03-20", "season"].isna().all()
+
+def test_swedish_holidays():
+    assert calendar_features.easter_sunday(2024) == date(2024, 3, 31)
+    holidays = calendar_features.calendar_features(pd.date_range("2024-06-20", "2024-06-22"), features=["holiday_se"])
+    assert holidays["holiday_se"].tolist() == [False, True, True]
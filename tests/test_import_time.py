@@ -0,0 +1,7 @@
+import pytest
+import benchmark_import_time
+
+@pytest.mark.parametrize("module", benchmark_import_time.MODULES)
+def test_import_stays_within_budget(module):
+    # Each check imports the module in a fresh interpreter
+    assert benchmark_import_time.check_module(module) == []
@@ -0,0 +1,21 @@
+import os
+from datetime import datetime
+import pandas as pd
+import pytest
+import integration_mock_up
+import process_data
+from conftest import REPO_ROOT
+
+@pytest.fixture(scope="module")
+def full_data():
+    data = process_data.get_data(os.path.join(REPO_ROOT, "data", "site_data.csv"), use_cache=False).reset_index()
+    data["Start time"] = pd.to_datetime(data["Start time"])
+    return data
+
+@pytest.mark.parametrize("engine", ["profile", "ridge"])
+def test_parallel_forecasts_match_serial(full_data, engine):
+    start, end = datetime(2024, 5, 31), datetime(2024, 6, 4)
+    serial = integration_mock_up.forecast_days(full_data, start, end, workers=1, engine=engine)
+    parallel = integration_mock_up.forecast_days(full_data, start, end, workers=2, engine=engine)
+    assert serial["date"].nunique() == 4
+    pd.testing.assert_frame_equal(parallel, serial, check_exact=True)
@@ -0,0 +1,120 @@
+import io
+import json
+import random
+import tarfile
+from collections import defaultdict
+import duckdb
+import pytest
+import nobil_data_analysis
+
+STATUSES = ["AVAILABLE", "CHARGING", "BLOCKED", "OUTOFORDER", "UNKNOWN", "RESERVED"]
+DAY = 86400
+START = 1748217600  # 2025-05-26 00:00 UTC
+
+def write_archive(path, events):
+    """
+    Writes status events (site_id, charger_id, timestamp, status) as data/*.json members of a tar.gz.
+    """
+    with tarfile.open(path, "w:gz") as tar:
+        for i, (site_id, charger_id, timestamp, status) in enumerate(events):
+            raw = json.dumps({"nobilId": site_id, "evseUid": charger_id, "status": status,
+                              "timestamp": timestamp}).encode()
+            info = tarfile.TarInfo(f"data/{i:07d}.json")
+            info.size = len(raw)
+            tar.addfile(info, io.BytesIO(raw))
+
+def reference_sessions(events):
+    """
+    The original state machine: per charger, events sorted by (timestamp, status); a session starts
+    on CHARGING and ends on AVAILABLE, BLOCKED, OUTOFORDER or UNKNOWN, ignoring RESERVED.
+    """
+    charger_logs = defaultdict(list)
+    for site_id, charger_id, timestamp, status in events:
+        charger_logs[(site_id, charger_id)].append((timestamp, status))
+
+    sessions = []
+    session_end_statuses = {"AVAILABLE", "BLOCKED", "OUTOFORDER", "UNKNOWN"}
+    for (site_id, charger_id), charger_events in charger_logs.items():
+        charging_start = None
+        for ts, status in sorted(charger_events):
+            if status == "CHARGING" and charging_start is None:
+                charging_start = ts
+            elif status in session_end_statuses and charging_start is not None:
+                sessions.append((site_id, charger_id, charging_start, ts, ts - charging_start))
+                charging_start = None
+    return sorted(sessions)
+
+def random_events(day, n=3000, seed=0):
+    rng = random.Random(seed)
+    events = []
+    for _ in range(n):
+        site_id = f"SWE_{rng.randint(1, 20):04d}"
+        events.append((site_id, f"{site_id}*E{rng.randint(1, 3)}", START + day * DAY + rng.randint(0, DAY - 1),
+                       rng.choices(STATUSES, [30, 35, 5, 3, 3, 4])[0]))
+    return events
+
+# Hand-written cases: RESERVED inside a session, repeated CHARGING, a session left open on day 0
+# and closed on day 1, and one left open at the end
+EDGE_EVENTS = [
+    ("SWE_9001", "SWE_9001*A", START + 100, "CHARGING"),
+    ("SWE_9001", "SWE_9001*A", START + 200, "RESERVED"),
+    ("SWE_9001", "SWE_9001*A", START + 300, "CHARGING"),
+    ("SWE_9001", "SWE_9001*A", START + 400, "AVAILABLE"),
+    ("SWE_9001", "SWE_9001*A", START + 500, "AVAILABLE"),
+    ("SWE_9001", "SWE_9001*A", START + DAY - 10, "CHARGING"),
+    ("SWE_9001", "SWE_9001*A", START + DAY + 50, "RESERVED"),
+    ("SWE_9001", "SWE_9001*A", START + DAY + 60, "CHARGING"),
+    ("SWE_9001", "SWE_9001*A", START + DAY + 70, "BLOCKED"),
+    ("SWE_9002", "SWE_9002*A", START + DAY - 5, "CHARGING"),
+    ("SWE_9002", "SWE_9002*A", START + 2 * DAY - 5, "CHARGING"),
+]
+
+def session_tuples(df):
+    return sorted(df[["site_id", "charger_id", "start", "end", "duration"]].itertuples(index=False, name=None))
+
+@pytest.fixture(scope="module")
+def archives(tmp_path_factory):
+    """
+    Two consecutive daily archives and all their events.
+    """
+    directory = tmp_path_factory.mktemp("archives")
+    days = [[e for e in random_events(day, seed=day) + EDGE_EVENTS if START + day * DAY <= e[2] < START + (day + 1) * DAY]
+            for day in range(2)]
+    paths = []
+    for day, events in enumerate(days):
+        paths.append(str(directory / f"2025-05-{26 + day}.tar.gz"))
+        write_archive(paths[-1], events)
+    return paths, days
+
+def test_vectorized_extraction_matches_state_machine(archives):
+    paths, days = archives
+    for path, events in zip(paths, days):
+        sessions = nobil_data_analysis.extract_charging_sessions(nobil_data_analysis.load_charger_statuses(path, workers=1))
+        assert session_tuples(sessions) == reference_sessions(events)
+
+def test_sessions_open_at_archive_boundary_are_carried_over(archives, tmp_path):
+    paths, days = archives
+    con = duckdb.connect(str(tmp_path / "sessions.db"))
+    nobil_data_analysis.ingest_sessions(con, paths, workers=1)
+    ingested = con.execute('SELECT site_id, charger_id, "start", "end", duration FROM session').fetchdf()
+
+    expected = reference_sessions(days[0] + days[1])
+    assert session_tuples(ingested) == expected
+    assert ("SWE_9001", "SWE_9001*A", START + DAY - 10, START + DAY + 70, 80) in expected
+    assert con.execute("SELECT site_id, \"start\" FROM open_session WHERE site_id = 'SWE_9002'").fetchall() == [
+        ("SWE_9002", START + DAY - 5)]
+
+def test_archives_older_than_the_last_ingested_are_rejected(archives, tmp_path):
+    paths, _ = archives
+    con = duckdb.connect(str(tmp_path / "sessions.db"))
+    nobil_data_analysis.ingest_sessions(con, paths[1:], workers=1)
+    nobil_data_analysis.ingest_sessions(con, paths[:1], workers=1)
+    assert [row[0] for row in con.execute("SELECT archive FROM ingested_archive").fetchall()] == ["2025-05-27.tar.gz"]
+
+def test_session_table_without_manifest_is_not_ingested_into(archives, tmp_path):
+    paths, _ = archives
+    con = duckdb.connect(str(tmp_path / "sessions.db"))
+    con.execute(nobil_data_analysis.SESSION_TABLE_SQL)
+    con.execute("INSERT INTO session (site_id, charger_id, \"start\", \"end\", duration) VALUES ('SWE_0001', 'E1', 1, 2, 1)")
+    with pytest.raises(ValueError):
+        nobil_data_analysis.ingest_sessions(con, paths, workers=1)
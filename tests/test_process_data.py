@@ -0,0 +1,142 @@
+import os
+import pandas as pd
+import pytest
+import process_data
+from conftest import REPO_ROOT
+
+SITE_DATA = os.path.join(REPO_ROOT, "data", "site_data.csv")
+
+def reference_get_data(file_path=SITE_DATA):
+    """
+    The original get_data: splits each session (lasting at most 1 hour) over its start and
+    stop hour, walking the sessions one by one with iterrows.
+    """
+    # Read CSV and parse dates for both start and stop times
+    df = pd.read_csv(file_path, parse_dates=["Start time", "Count.Stop time"])
+
+    # Calculate session duration in minutes
+    df["Duration"] = (df["Count.Stop time"] - df["Start time"]).dt.total_seconds() / 60
+
+    # Filter out sessions with duration less than 5 minutes or greater than 60 minutes
+    df = df[(df["Duration"] >= 5) & (df["Duration"] <= 60)]
+
+    # Rename the energy column for consistency
+    df = df.rename(columns={"Modified Count.Energy (Wh)": "Energy_Wh"})
+
+    # Convert Energy_Wh to numeric and drop rows with NaN values in Energy_Wh
+    df["Energy_Wh"] = pd.to_numeric(df["Energy_Wh"], errors="coerce")
+    df = df.dropna(subset=["Energy_Wh"])
+
+    #Adjust obfuscated energy data by dividing by 10, convert to kwh by dividing by 1000
+    df["Energy_Wh"] = df["Energy_Wh"] / 10 / 1000
+
+    # List to store hourly contributions
+    hourly_data = []
+
+    # Process each session
+    for _, row in df.iterrows():
+        start = row["Start time"]
+        stop = row["Count.Stop time"]
+        energy = row["Energy_Wh"]
+
+        # If the session is completely within one hour, assign all energy to that hour.
+        if start.floor("h") == stop.floor("h"):
+            hourly_data.append({"Start time": start.floor("h"), "Energy_Wh": energy})
+        else:
+            # The session spans two hours: split proportionally to time
+            first_hour_end = start.floor("h") + pd.Timedelta(hours=1)
+            first_fraction = (first_hour_end - start).total_seconds() / (stop - start).total_seconds()
+            second_fraction = 1 - first_fraction
+
+            hourly_data.append({"Start time": start.floor("h"), "Energy_Wh": energy * first_fraction})
+            hourly_data.append({"Start time": stop.floor("h"), "Energy_Wh": energy * second_fraction})
+
+    # Convert list to DataFrame and aggregate energy per hour
+    hourly_df = pd.DataFrame(hourly_data)
+    hourly_df = hourly_df.groupby("Start time", as_index=True).sum()
+
+    return hourly_df
+
+@pytest.fixture(scope="module")
+def reference():
+    return reference_get_data()
+
+def test_get_data_matches_reference_loop(reference):
+    result = process_data.get_data(SITE_DATA, use_cache=False)
+    pd.testing.assert_frame_equal(result, reference, check_exact=True, check_freq=False)
+
+def test_split_sessions_by_hour_two_hour_session():
+    fragments = process_data.split_sessions_by_hour(pd.Series(["2024-01-01 10:45"]), pd.Series(["2024-01-01 11:15"]),
+                                                    [2.0])
+    assert fragments["Start time"].tolist() == [pd.Timestamp("2024-01-01 10:00"), pd.Timestamp("2024-01-01 11:00")]
+    assert fragments["Energy_Wh"].tolist() == [1.0, 1.0]
+
+def test_cache_key_depends_on_profile_parameters(tmp_path):
+    early = process_data.get_data(SITE_DATA, max_duration=None, profile=process_data.tapered_profile(0.5, 0.8),
+                                  cache_dir=tmp_path)
+    late = process_data.get_data(SITE_DATA, max_duration=None, profile=process_data.tapered_profile(0.8, 0.5),
+                                 cache_dir=tmp_path)
+    assert not early.equals(late)
+    assert len(os.listdir(tmp_path)) == 2
+
+def test_profiles_without_key_bypass_cache(tmp_path):
+    process_data.get_data(SITE_DATA, profile=lambda progress: progress, cache_dir=tmp_path)
+    assert not tmp_path.exists() or not os.listdir(tmp_path)
+
+def test_update_data_full_rebuild_reads_last_row_without_newline(tmp_path):
+    # The export does not end in a newline
+    with open(SITE_DATA, "rb") as f:
+        assert not f.read().endswith(b"\n")
+    result = process_data.update_data(SITE_DATA, store_dir=str(tmp_path))
+    pd.testing.assert_frame_equal(result, process_data.get_data(SITE_DATA, use_cache=False), check_freq=False)
+
+def test_update_data_waits_for_partly_written_rows(tmp_path):
+    with open(SITE_DATA, "rb") as f:
+        content = f.read()
+    csv_path = tmp_path / "site_data.csv"
+    store_dir = tmp_path / "incremental"
+    expected = process_data.get_data(SITE_DATA, use_cache=False)
+
+    # Start from whole rows, then append pieces that cut rows in the middle, then finish the export
+    first = content.index(b"\n", len(content) // 3) + 1
+    for end in (first, 2 * len(content) // 3 + 3, len(content)):
+        csv_path.write_bytes(content[:end])
+        result = process_data.update_data(str(csv_path), store_dir=str(store_dir))
+
+    # The file just grew, so its last row (without newline) may still be being written
+    assert result["Energy_Wh"].sum() < expected["Energy_Wh"].sum()
+
+    # Once the file stops growing the last row is complete
+    result = process_data.update_data(str(csv_path), store_dir=str(store_dir))
+    pd.testing.assert_frame_equal(result, expected, check_freq=False)
+
+def test_get_data_chunked_reports_unparsed_dates(tmp_path, capsys):
+    lines = open(SITE_DATA, encoding="utf-8").read().splitlines()
+    lines[5] = lines[5].replace("2024-01-01 ", "01/01/2024 ")
+    csv_path = tmp_path / "site_data.csv"
+    csv_path.write_text("\n".join(lines), encoding="utf-8")
+
+    result = process_data.get_data_chunked(str(csv_path), max_memory_mb=0.5)
+    assert "Dropped 1 sessions" in capsys.readouterr().out
+    expected = process_data.get_data(SITE_DATA, use_cache=False)
+    assert result["Energy_Wh"].sum() < expected["Energy_Wh"].sum()
+
+def test_invalid_sessions_are_dropped_without_duration_filters():
+    df = pd.DataFrame({
+        "Start time": pd.to_datetime(["2024-01-01 10:00", None, "2024-01-01 12:00", "2024-01-01 13:00"]),
+        "Count.Stop time": pd.to_datetime(["2024-01-01 10:30", "2024-01-01 11:00", None, "2024-01-01 12:30"]),
+        "Modified Count.Energy (Wh)": [10000, 20000, 30000, 40000],
+    })
+    hourly = process_data.aggregate_sessions(df, min_duration=None, max_duration=None)
+    assert hourly.index.tolist() == [pd.Timestamp("2024-01-01 10:00")]
+    assert hourly["Energy_Wh"].tolist() == [1.0]
+
+def test_split_sessions_by_hour_rejects_invalid_sessions():
+    with pytest.raises(ValueError):
+        process_data.split_sessions_by_hour(pd.Series([None]), pd.Series(["2024-01-01 11:15"]), [1.0])
+    with pytest.raises(ValueError):
+        process_data.split_sessions_by_hour(pd.Series(["2024-01-01 11:15"]), pd.Series(["2024-01-01 10:45"]), [1.0])
+
+def test_tapered_profile_rejects_taper_start_at_end():
+    with pytest.raises(ValueError):
+        process_data.tapered_profile(taper_start=1)